@@ -0,0 +1,70 @@
+import hashlib, json, pathlib, sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+CACHE = ROOT / "runs" / "eval_cache.jsonl"
+
+# bump when the scoring procedure changes in a way that invalidates old verdicts
+CACHE_VERSION = 3
+
+def tree_digest(root: pathlib.Path, pattern: str = "*.py") -> str:
+    """sha256 over (relative path, bytes) of every file matching pattern under root."""
+    h = hashlib.sha256()
+    for p in sorted(root.rglob(pattern)):
+        if "__pycache__" in p.parts:
+            continue
+        h.update(p.relative_to(root).as_posix().encode() + b"\0")
+        h.update(p.read_bytes() + b"\0")
+    return h.hexdigest()
+
+def env_digest(extra: str = "") -> str:
+    """
+    Everything besides the sample that decides a verdict: the problems package
+    (problems.py plus the split modules the test_ext_* files import), the
+    tests tree, the interpreter version and `extra` (e.g. the resource limits).
+    """
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_VERSION}\0{sys.version}\0{extra}\0".encode())
+    h.update(tree_digest(ROOT / "problems").encode())
+    h.update(tree_digest(ROOT / "tests").encode())
+    return h.hexdigest()
+
+def sample_key(env: str, problem: str, program: str) -> str:
+    """program: eval.dedup.program_hash of the sample, so formatting-only variants share a key."""
+    return hashlib.sha256(f"{env}\0{problem}\0{program}".encode()).hexdigest()
+
+class EvalCache:
+    """
+    Append-only JSON-lines map of sample_key -> {"outcome", "perf", "seconds"}.
+    Later lines win, so re-scoring a key just appends a fresh entry.
+    """
+
+    def __init__(self, path: pathlib.Path = CACHE):
+        self.path = pathlib.Path(path)
+        self.entries = {}
+        self._f = None
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        e = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line from an interrupted run
+                    self.entries[e.pop("key")] = e
+
+    def get(self, key: str):
+        return self.entries.get(key)
+
+    def put(self, key: str, entry: dict) -> None:
+        if self._f is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._f = open(self.path, "a")
+        self.entries[key] = entry
+        self._f.write(json.dumps({"key": key, **entry}) + "\n")
+        self._f.flush()
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
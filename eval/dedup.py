@@ -0,0 +1,25 @@
+import ast, hashlib
+
+_DOC_OWNERS = (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+def normalized_source(src: str) -> str:
+    """
+    Canonical text of a sample: docstrings dropped, then ast.unparse(), which
+    also drops comments and normalizes whitespace and quoting. Two samples
+    with the same normalized source are the same program for scoring.
+    Unparseable sources are returned unchanged (they still score, as failures).
+    """
+    try:
+        tree = ast.parse(src)
+    except (SyntaxError, ValueError):
+        return src
+    for node in ast.walk(tree):
+        if isinstance(node, _DOC_OWNERS) and node.body:
+            first = node.body[0]
+            if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) \
+                    and isinstance(first.value.value, str):
+                node.body = node.body[1:] or [ast.Pass()]
+    return ast.unparse(tree)
+
+def program_hash(src: str) -> str:
+    return hashlib.sha256(normalized_source(src).encode()).hexdigest()
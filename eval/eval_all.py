@@ -1,41 +1,191 @@
-import pathlib, json, subprocess, sys, os
+import pathlib, json, os, argparse, tempfile, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from eval.run_and_score import score_sample, measure_sample, DEFAULT_LIMITS, PASSED
+from eval.cache import EvalCache, env_digest, sample_key
+from eval.results import PERF_FIELDS, ResultsWriter, row_key
+from eval.store import ResultsStore, DB
+from eval.dedup import program_hash
+from eval.schedule import DurationHistory, longest_first, makespan
+from eval.workloads import workloads_digest
+from eval.eval_passk import RunningStats, bootstrap_ci, build_table, load_rows, write_metrics
+from eval.selection import load_index
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 RAW = ROOT / "runs" / "raw_generations"
 RESULTS = ROOT / "runs" / "results.jsonl"
+METRICS = ROOT / "runs" / "metrics.json"
 
 def iter_samples():
-    for prob_dir in RAW.iterdir():
+    # sorted so the job list (and hence results.jsonl) does not depend on filesystem order
+    for prob_dir in sorted(RAW.iterdir()):
         if not prob_dir.is_dir(): continue
         problem = prob_dir.name
-        for model_dir in prob_dir.iterdir():
-            for strat_dir in model_dir.iterdir():
-                for sample in strat_dir.glob("sample_*.py"):
+        for model_dir in sorted(p for p in prob_dir.iterdir() if p.is_dir()):
+            for strat_dir in sorted(p for p in model_dir.iterdir() if p.is_dir()):
+                for sample in sorted(strat_dir.glob("sample_*.py"), key=lambda p: int(p.stem.split("_")[-1])):
                     yield problem, model_dir.name, strat_dir.name, sample
 
+_ZYGOTE = None
+_LIMITS = DEFAULT_LIMITS
+_PERF = True
+_INDEX = None
+
+def init_worker(zygote_dir, limits, fastpath=True, perf=True, index=None):
+    """Pool initializer: with a zygote dir, turn this worker into a warm fork-server."""
+    global _ZYGOTE, _LIMITS, _PERF, _INDEX
+    _LIMITS, _PERF, _INDEX = limits, perf, index
+    if zygote_dir is not None:
+        from eval.zygote import Zygote
+        _ZYGOTE = Zygote(zygote_dir, fastpath=fastpath, index=index)
+
+def make_row(job, outcome, perf=None):
+    problem, model_key, strategy, sample_path = job
+    model_family, model_name = model_key.split("-", 1)
+    return {
+        "problem": problem,
+        "model_family": model_family,
+        "model_name": model_name,
+        "strategy": strategy,
+        "sample_id": int(sample_path.stem.split("_")[-1]),
+        "passed": outcome == PASSED,
+        "outcome": outcome,
+        # eval.workloads measurements of a passing sample; None when not measured
+        **{k: (perf or {}).get(k) for k in PERF_FIELDS}
+    }
+
+def evaluate(job):
+    """Score one (problem, model_key, strategy, sample_path) job; runs inside a pool worker."""
+    problem, _, _, sample_path = job
+    t0 = time.perf_counter()
+    if _ZYGOTE is not None:
+        outcome, perf = _ZYGOTE.run(problem, str(sample_path), _LIMITS, perf=_PERF)
+    else:
+        outcome = score_sample(problem, str(sample_path), _LIMITS, _INDEX)
+        perf = measure_sample(problem, str(sample_path), _LIMITS) if _PERF and outcome == PASSED else None
+    return make_row(job, outcome, perf), time.perf_counter() - t0
+
 def main():
-    RESULTS.write_text("")  
-    for problem, model_key, strategy, sample_path in iter_samples():
-        model_family, model_name = model_key.split("-", 1)
-        out = subprocess.check_output([
-            sys.executable, "-m", "eval.run_and_score",
-            "--problem", problem,
-            "--sample_path", str(sample_path)
-        ], text=True).strip()
-        ok = json.loads(out)["pass"]
-        row = {
-            "problem": problem,
-            "model_family": model_family,
-            "model_name": model_name,
-            "strategy": strategy,
-            "sample_id": int(sample_path.stem.split("_")[-1]),
-            "passed": bool(ok)
-        }
-        with open(RESULTS, "a") as f:
-            f.write(json.dumps(row) + "\n")
-        print(row)
-
-    agg = subprocess.check_output([sys.executable, "-m", "eval.eval_passk", str(RESULTS)], text=True)
-    (ROOT / "runs" / "metrics.json").write_text(agg)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                    help="number of samples evaluated concurrently (default: all cores)")
+    ap.add_argument("--no-zygote", action="store_true",
+                    help="spawn a fresh pytest per sample instead of forking warm workers")
+    ap.add_argument("--no-fastpath", action="store_true",
+                    help="always run pytest, even for problems whose tests compile to a table")
+    ap.add_argument("--no-perf", action="store_true",
+                    help="skip the runtime/CPU/peak-memory workload for passing samples")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="re-evaluate every sample even if runs/eval_cache.jsonl has a verdict")
+    ap.add_argument("--resume", action="store_true",
+                    help="keep existing results.jsonl rows and only add the missing samples")
+    ap.add_argument("--cpu-limit", type=float, default=DEFAULT_LIMITS["cpu_s"],
+                    help="CPU seconds per sample, 0 for none (outcome 'timeout' when hit)")
+    ap.add_argument("--wall-limit", type=float, default=DEFAULT_LIMITS["wall_s"],
+                    help="wall-clock seconds per sample, 0 for none (outcome 'timeout' when hit)")
+    ap.add_argument("--mem-limit", type=int, default=DEFAULT_LIMITS["mem_mb"],
+                    help="address-space MB per sample, 0 for none (outcome 'oom' when hit)")
+    ap.add_argument("--db", nargs="?", const=str(DB), default=None,
+                    help="also write rows to a SQLite results store (default runs/results.sqlite)")
+    ap.add_argument("--ci", action="store_true",
+                    help="add bootstrap confidence bounds to the pass@k values in metrics.json")
+    ap.add_argument("--metrics-every", type=float, default=5.0,
+                    help="seconds between live rewrites of metrics.json during the sweep")
+    args = ap.parse_args()
+    limits = {"cpu_s": args.cpu_limit, "wall_s": args.wall_limit, "mem_mb": args.mem_limit}
+
+    use_zygote = hasattr(os, "fork") and not args.no_zygote
+    # (re)built here, once: workers get it via initargs instead of racing to rebuild it themselves,
+    # and a failed build stops the sweep before ResultsWriter truncates results.jsonl
+    index = load_index()
+    writer = ResultsWriter(RESULTS, resume=args.resume)
+    jobs = [job for job in iter_samples() if row_key(make_row(job, None)) not in writer.done]
+    if args.resume:
+        print(f"resuming: {len(writer.done)} rows already in {RESULTS.name}")
+    store = ResultsStore(args.db, resume=args.resume) if args.db else None
+    if store is not None and store.count() != len(writer.done):
+        store.import_jsonl(RESULTS)  # bring a new or stale store level with the rows being resumed
+
+    # pass@k counters updated as each result arrives; metrics.json is republished from them on a timer
+    live = RunningStats(load_rows(RESULTS) if args.resume else ())
+    def publish():
+        groups, n, c, perf = live.snapshot()
+        write_metrics(METRICS, build_table(groups, n, c, perf, ci=bootstrap_ci(n, c, (1,5)) if args.ci else None))
+
+    # samples whose (normalized program, problems/, tests/, python, limits, workloads) hash was already
+    # scored are not re-run; samples sharing a key in this sweep are scored once and fanned out
+    cache = EvalCache()
+    env = env_digest(json.dumps([limits, None if args.no_perf else workloads_digest()], sort_keys=True))
+    programs = [program_hash(job[3].read_text()) for job in jobs]
+    keys = [sample_key(env, job[0], prog) for job, prog in zip(jobs, programs)]
+    rows = [None] * len(jobs)
+    if not args.no_cache:
+        for i, key in enumerate(keys):
+            hit = cache.get(key)
+            if hit is not None:
+                rows[i] = make_row(jobs[i], hit["outcome"], hit.get("perf"))
+    todo = {}
+    for i, key in enumerate(keys):
+        if rows[i] is None:
+            todo.setdefault(key, i)
+    n_cached = sum(row is not None for row in rows)
+    print(f"{n_cached} cached, {len(jobs) - n_cached} to evaluate as {len(todo)} unique programs")
+
+    # dispatch the longest-expected programs first so slow samples do not end up at the tail
+    history = DurationHistory()
+    group = lambda i: "/".join(jobs[i][:3])
+    expected = {key: history.predict(programs[i], group(i)) for key, i in todo.items()}
+    order = longest_first(todo, expected.get)
+    workers = max(1, args.workers)
+
+    with tempfile.TemporaryDirectory(prefix="eval_all_") as zdir, writer, \
+         ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(zdir if use_zygote else None, limits, not args.no_fastpath, not args.no_perf, index)) as pool:
+        t0 = last_publish = time.perf_counter()
+        futures = {pool.submit(evaluate, jobs[todo[key]]): key for key in order}
+        # every job index a unique program's result fans out to (duplicates share one evaluation)
+        fan = {}
+        for i, key in enumerate(keys):
+            if rows[i] is None:
+                fan.setdefault(key, []).append(i)
+            else:
+                live.add(rows[i])
+        written = 0
+
+        def flush_ready():
+            # results.jsonl stays in job order: write the prefix of rows that are already known
+            nonlocal written
+            while written < len(rows) and rows[written] is not None:
+                writer.write(rows[written])
+                if store is not None:
+                    store.write(rows[written], programs[written])
+                print(rows[written])
+                written += 1
+
+        flush_ready()
+        for future in as_completed(futures):
+            key = futures[future]
+            row, seconds = future.result()
+            perf = {k: row[k] for k in PERF_FIELDS} if row["runtime_s"] is not None else None
+            first = todo[key]
+            cache.put(key, {"outcome": row["outcome"], "perf": perf, "seconds": round(seconds, 4)})
+            history.record(programs[first], group(first), seconds)
+            for i in fan[key]:
+                rows[i] = make_row(jobs[i], row["outcome"], perf)
+                live.add(rows[i])
+            flush_ready()
+            if time.perf_counter() - last_publish >= args.metrics_every:
+                publish()
+                last_publish = time.perf_counter()
+        actual = time.perf_counter() - t0
+    cache.close()
+    if store is not None:
+        store.close()
+    history.save()
+    if order:
+        predicted = makespan([expected[key] for key in order], workers)
+        print(f"\n=== Makespan for {len(order)} programs on {workers} workers: "
+              f"predicted {predicted:.2f}s, actual {actual:.2f}s ===")
+
+    publish()
     print("\n=== Aggregated pass@k written to runs/metrics.json ===")
 
 if __name__ == "__main__":
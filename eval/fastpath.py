@@ -0,0 +1,128 @@
+import ast, copy, operator
+from eval.cache import ROOT
+from eval.run_and_score import PASSED, FAILED, OOM
+from eval.selection import load_index
+
+_OPS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+    ast.Is: operator.is_, ast.IsNot: operator.is_not,
+    ast.In: lambda a, b: a in b, ast.NotIn: lambda a, b: a not in b,
+}
+
+class Unextractable(Exception):
+    """A test uses something other than literal calls and literal comparisons."""
+
+def _imported(tree: ast.Module) -> dict:
+    """local name -> function name, for `from problems.problems import ...`."""
+    names = {}
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module == "problems.problems":
+            for a in node.names:
+                names[a.asname or a.name] = a.name
+    return names
+
+def _literal(node: ast.AST, consts: dict):
+    if isinstance(node, ast.Name) and node.id in consts:
+        return copy.deepcopy(consts[node.id])
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        raise Unextractable(ast.dump(node)) from None
+
+def _call(node: ast.AST, funcs: dict, consts: dict):
+    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in funcs):
+        raise Unextractable(ast.dump(node))
+    args = tuple(_literal(a, consts) for a in node.args)
+    kwargs = {k.arg: _literal(k.value, consts) for k in node.keywords if k.arg}
+    if len(kwargs) != len(node.keywords):
+        raise Unextractable("**kwargs")
+    return ("call", funcs[node.func.id], args, kwargs)
+
+def extract_test(fn: ast.FunctionDef, funcs: dict) -> list:
+    """
+    Steps for one test function, or Unextractable. Supported statements:
+      name = <literal>                      (constant, substituted into later calls)
+      name = f(<literals>)                  (result, checked by later asserts)
+      assert f(<literals>) <op> <literal>   (op: == != is is-not in not-in)
+      assert name <op> <literal>
+    """
+    if fn.decorator_list or fn.args.args or fn.args.vararg or fn.args.kwarg:
+        raise Unextractable(fn.name)
+    consts, results, steps = {}, set(), []
+    for stmt in fn.body:
+        if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name):
+            name = stmt.targets[0].id
+            if isinstance(stmt.value, ast.Call):
+                steps.append(_call(stmt.value, funcs, consts) + (name,))
+                results.add(name)
+                consts.pop(name, None)
+            else:
+                consts[name] = _literal(stmt.value, consts)
+                results.discard(name)
+        elif isinstance(stmt, ast.Assert) and isinstance(stmt.test, ast.Compare) \
+                and len(stmt.test.ops) == 1 and type(stmt.test.ops[0]) in _OPS:
+            left, op = stmt.test.left, _OPS[type(stmt.test.ops[0])]
+            expected = _literal(stmt.test.comparators[0], consts)
+            if isinstance(left, ast.Name) and left.id in results:
+                steps.append(("check", left.id, op, expected))
+            else:
+                steps.append(_call(left, funcs, consts) + ("_",))
+                steps.append(("check", "_", op, expected))
+        elif isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant):
+            continue  # docstring
+        else:
+            raise Unextractable(f"{fn.name}: line {stmt.lineno}")
+    return steps
+
+def load_table(problem: str, index: dict | None = None):
+    """All steps of the problem's indexed tests, or None if any of them needs pytest."""
+    index = load_index() if index is None else index
+    entry = index.get(problem)
+    if not entry or not entry["nodeids"]:
+        return None
+    trees, table = {}, []
+    try:
+        for nodeid in entry["nodeids"]:
+            rel, _, name = nodeid.partition("::")
+            if "::" in name or "[" in name:
+                raise Unextractable(nodeid)  # classes / parametrized ids
+            if rel not in trees:
+                trees[rel] = ast.parse((ROOT / rel).read_text())
+            tree = trees[rel]
+            fn = next((n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name == name), None)
+            if fn is None:
+                raise Unextractable(nodeid)
+            table.extend(extract_test(fn, _imported(tree)))
+    except (Unextractable, SyntaxError):
+        return None
+    return table
+
+def load_tables(index: dict | None = None) -> dict:
+    """problem -> table, for the problems whose tests are fully extractable."""
+    index = load_index() if index is None else index
+    tables = {p: load_table(p, index) for p in index}
+    return {p: t for p, t in tables.items() if t is not None}
+
+def run_table(table: list, gen_code: str, filename: str, ns: dict) -> str:
+    """
+    Exec the candidate into ns (a fresh copy of the base problems.problems
+    globals) and replay the table directly. Returns PASSED, FAILED or OOM;
+    time and memory caps are the caller's job (the zygote runs this in its
+    limited child).
+    """
+    try:
+        exec(compile(gen_code, filename, "exec"), ns)
+        results = {}
+        for step in table:
+            if step[0] == "call":
+                _, func, args, kwargs, var = step
+                results[var] = ns[func](*copy.deepcopy(args), **copy.deepcopy(kwargs))
+            else:
+                _, var, op, expected = step
+                if not op(results[var], expected):
+                    return FAILED
+    except MemoryError:
+        return OOM
+    except Exception:
+        return FAILED
+    return PASSED
@@ -0,0 +1,66 @@
+import json, os, operator, pathlib
+
+# results.jsonl columns shared by the writer, the SQLite store and the pass@k aggregation
+GROUP_FIELDS = ("problem", "model_family", "model_name", "strategy")
+PERF_FIELDS = ("runtime_s", "cpu_s", "peak_kb")
+group_key = operator.itemgetter(*GROUP_FIELDS)
+row_key = operator.itemgetter(*GROUP_FIELDS, "sample_id")
+
+class ResultsWriter:
+    """
+    One buffered append handle for results.jsonl.
+
+    Rows are flushed and fsync'ed every `sync_every` rows and on close, so a
+    crash loses at most one batch. With resume=True the existing file is kept
+    (a torn trailing line is cut off) and `done` holds the row_key of every
+    row already in it; otherwise the file is truncated.
+    """
+
+    def __init__(self, path: pathlib.Path, resume: bool = False, sync_every: int = 64):
+        self.path = pathlib.Path(path)
+        self.sync_every = max(1, sync_every)
+        self.done = set()
+        self._pending = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if resume and self.path.exists():
+            self._load()
+        else:
+            self.path.write_text("")
+        self._f = open(self.path, "a", buffering=1 << 16)
+
+    def _load(self) -> None:
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    self.done.add(row_key(json.loads(line)))
+                except (json.JSONDecodeError, KeyError):
+                    break
+                good += len(line)
+        if good != self.path.stat().st_size:
+            os.truncate(self.path, good)
+
+    def write(self, row: dict) -> None:
+        self._f.write(json.dumps(row) + "\n")
+        self.done.add(row_key(row))
+        self._pending += 1
+        if self._pending >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._pending = 0
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self.sync()
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
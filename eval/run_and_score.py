@@ -1,41 +1,126 @@
-import sys, subprocess, json, tempfile, shutil, pathlib
+import sys, subprocess, json, tempfile, shutil, pathlib, signal, math
+from eval.selection import tests_for
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 
-def run_one_sample(problem_name: str, py_path: str) -> bool:
+# outcomes recorded in results.jsonl; only PASSED counts as a pass
+PASSED, FAILED, TIMEOUT, OOM = "passed", "failed", "timeout", "oom"
+
+# per-sample caps; None or 0 disables a cap
+DEFAULT_LIMITS = {"cpu_s": 10, "wall_s": 30, "mem_mb": 2048}
+
+def apply_limits(limits: dict) -> None:
+    """setrlimit() the CPU-time and address-space caps; call in the child only."""
+    import resource
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    if limits.get("cpu_s"):
+        # SIGXCPU at the soft limit, SIGKILL a second later if it is ignored
+        cpu = int(math.ceil(limits["cpu_s"]))
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    if limits.get("mem_mb"):
+        cap = int(limits["mem_mb"]) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (cap, cap))
+
+def outcome_from_signal(sig: int) -> str:
+    """Map a child's fatal signal to an outcome (SIGKILL without a wall timeout is the OOM killer)."""
+    if sig in (signal.SIGXCPU, signal.SIGALRM):
+        return TIMEOUT
+    if sig == signal.SIGKILL:
+        return OOM
+    return FAILED
+
+def write_project(workdir: pathlib.Path, gen_code: str | None = None, test_modules: list[str] | None = None) -> None:
+    """
+    Lay out an isolated copy of the repo under workdir:
+      problems/  (repo modules; problems.py gets gen_code appended as an override)
+      tests/     (copied from repo; only test_modules, e.g. "tests/test_problems.py", if given)
+    The split modules (problems/longest_common_prefix.py, ...) are copied too,
+    otherwise the test_ext_* modules fail to import and abort collection.
+    """
+    pkg = workdir / "problems"
+    pkg.mkdir(parents=True, exist_ok=True)
+    for src in (ROOT / "problems").glob("*.py"):
+        if src.name != "problems.py":
+            shutil.copyfile(src, pkg / src.name)
+
+    orig = (ROOT / "problems" / "problems.py").read_text()
+    if gen_code is None:
+        combined = orig
+    else:
+        combined = orig.rstrip() + "\n\n# === Override injected ===\n" + gen_code + "\n"
+    (pkg / "problems.py").write_text(combined)
+
+    if test_modules is None:
+        shutil.copytree(ROOT / "tests", workdir / "tests", ignore=shutil.ignore_patterns("__pycache__"))
+    else:
+        (workdir / "tests").mkdir(parents=True, exist_ok=True)
+        for rel in ["tests/__init__.py", *test_modules]:
+            shutil.copyfile(ROOT / rel, workdir / rel)
+
+def pytest_selection(problem_name: str, index: dict | None = None):
+    """(test modules to copy, pytest args): the indexed node ids, or `-k problem` if unindexed."""
+    sel = tests_for(problem_name, index)
+    if sel is None:
+        return None, ["-k", problem_name, "tests"]
+    return sel
+
+def score_sample(problem_name: str, py_path: str, limits: dict | None = None, index: dict | None = None) -> str:
     """
-    Run pytest for one generated sample by creating an isolated temp project:
-      temp/
-        problems/  (original problems.py + appended override function)
-        tests/     (copied from repo)
-    This ensures tests import the local 'problems' package, not the repo one.
+    Run pytest for one generated sample by creating an isolated temp project
+    (see write_project). This ensures tests import the local 'problems'
+    package, not the repo one. Only the test modules and node ids indexed for
+    the problem (eval.selection) are copied and run.
+
+    The pytest child runs under `limits` (DEFAULT_LIMITS if None) and the
+    result is one of PASSED, FAILED, TIMEOUT or OOM.
     """
+    limits = DEFAULT_LIMITS if limits is None else limits
+    modules, selection = pytest_selection(problem_name, index)
+    if not selection:
+        return FAILED  # nothing selected: pytest would exit 5
     tmpdir = pathlib.Path(tempfile.mkdtemp())
     try:
-        pkg = tmpdir / "problems"
-        pkg.mkdir(parents=True, exist_ok=True)
-        (pkg / "__init__.py").write_text("")
-
-        orig = ROOT / "problems" / "problems.py"
-        gen_code = pathlib.Path(py_path).read_text()
-        combined = orig.read_text().rstrip() + "\n\n# === Override injected ===\n" + gen_code + "\n"
-        (pkg / "problems.py").write_text(combined)
-
-        src_tests = ROOT / "tests"
-        dst_tests = tmpdir / "tests"
-        shutil.copytree(src_tests, dst_tests)
-
-        cmd = [sys.executable, "-m", "pytest", "-q", "-k", problem_name, "tests"]
-        proc = subprocess.run(cmd, cwd=tmpdir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-        return proc.returncode == 0
+        write_project(tmpdir, pathlib.Path(py_path).read_text(), modules)
+        cmd = [sys.executable, "-m", "pytest", "-q", *selection]
+        try:
+            proc = subprocess.run(cmd, cwd=tmpdir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                  timeout=limits.get("wall_s"), preexec_fn=lambda: apply_limits(limits))
+        except subprocess.TimeoutExpired:
+            return TIMEOUT
+        if proc.returncode == 0:
+            return PASSED
+        if proc.returncode < 0:
+            return outcome_from_signal(-proc.returncode)
+        return OOM if "MemoryError" in proc.stdout else FAILED
     finally:
         shutil.rmtree(tmpdir, ignore_errors=True)
 
+def measure_sample(problem_name: str, py_path: str, limits: dict | None = None):
+    """eval.workloads.measure() of a candidate in a fresh, rlimited interpreter; None if it does not finish."""
+    limits = DEFAULT_LIMITS if limits is None else limits
+    cmd = [sys.executable, "-m", "eval.workloads", "--problem", problem_name, "--sample_path", str(py_path)]
+    try:
+        proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True,
+                              timeout=limits.get("wall_s"), preexec_fn=lambda: apply_limits(limits))
+    except subprocess.TimeoutExpired:
+        return None
+    if proc.returncode != 0 or not proc.stdout.strip():
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def run_one_sample(problem_name: str, py_path: str, limits: dict | None = None) -> bool:
+    return score_sample(problem_name, py_path, limits) == PASSED
+
 if __name__ == "__main__":
     import argparse
     ap = argparse.ArgumentParser()
     ap.add_argument("--problem", required=True)
     ap.add_argument("--sample_path", required=True)
+    ap.add_argument("--cpu-limit", type=float, default=DEFAULT_LIMITS["cpu_s"], help="CPU seconds")
+    ap.add_argument("--wall-limit", type=float, default=DEFAULT_LIMITS["wall_s"], help="wall-clock seconds")
+    ap.add_argument("--mem-limit", type=int, default=DEFAULT_LIMITS["mem_mb"], help="address space, MB")
     args = ap.parse_args()
-    ok = run_one_sample(args.problem, args.sample_path)
-    print(json.dumps({"problem": args.problem, "sample_path": args.sample_path, "pass": ok}))
+    limits = {"cpu_s": args.cpu_limit, "wall_s": args.wall_limit, "mem_mb": args.mem_limit}
+    outcome = score_sample(args.problem, args.sample_path, limits)
+    print(json.dumps({"problem": args.problem, "sample_path": args.sample_path,
+                      "pass": outcome == PASSED, "outcome": outcome}))
@@ -0,0 +1,49 @@
+import heapq, json, os, pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+HISTORY = ROOT / "runs" / "eval_durations.json"
+
+class DurationHistory:
+    """
+    Observed evaluation seconds, kept per program hash (eval.dedup.program_hash)
+    and as a moving average per "problem/model_key/strategy" group. Used to
+    dispatch the longest-expected jobs first.
+    """
+
+    def __init__(self, path: pathlib.Path = HISTORY, alpha: float = 0.3):
+        self.path = pathlib.Path(path)
+        self.alpha = alpha
+        data = json.loads(self.path.read_text()) if self.path.exists() else {}
+        self.by_sample = data.get("by_sample", {})
+        self.by_group = data.get("by_group", {})
+
+    def predict(self, sample: str, group: str) -> float:
+        if sample in self.by_sample:
+            return self.by_sample[sample]
+        if group in self.by_group:
+            return self.by_group[group]
+        known = list(self.by_group.values())
+        return sum(known) / len(known) if known else 1.0
+
+    def record(self, sample: str, group: str, seconds: float) -> None:
+        self.by_sample[sample] = round(seconds, 4)
+        prev = self.by_group.get(group)
+        avg = seconds if prev is None else (1 - self.alpha) * prev + self.alpha * seconds
+        self.by_group[group] = round(avg, 4)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"by_sample": self.by_sample, "by_group": self.by_group}))
+        os.replace(tmp, self.path)
+
+def longest_first(items, expected):
+    """items sorted by expected(item), largest first (stable for ties)."""
+    return sorted(items, key=expected, reverse=True)
+
+def makespan(durations, workers: int) -> float:
+    """Finish time of greedily dispatching durations, in order, to the first free of `workers`."""
+    free = [0.0] * max(1, workers)
+    for d in durations:
+        heapq.heapreplace(free, free[0] + d)
+    return max(free)
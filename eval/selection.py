@@ -0,0 +1,73 @@
+import ast, json, os, pathlib, subprocess, sys, tempfile, shutil
+from eval.cache import ROOT, tree_digest
+
+INDEX = ROOT / "runs" / "test_index.json"
+
+def problem_names() -> list[str]:
+    """Top-level functions of problems/problems.py, i.e. every name `-k` is ever given."""
+    tree = ast.parse((ROOT / "problems" / "problems.py").read_text())
+    return [n.name for n in tree.body if isinstance(n, ast.FunctionDef)]
+
+def index_digest() -> str:
+    return tree_digest(ROOT / "tests") + tree_digest(ROOT / "problems")
+
+def _collect(names):
+    """Runs in a child process: collect `-k name` for each name inside a temp project."""
+    import pytest
+    from eval.run_and_score import write_project
+
+    class Recorder:
+        def __init__(self):
+            self.nodeids = []
+        def pytest_collection_finish(self, session):
+            self.nodeids = [item.nodeid for item in session.items]
+
+    out = {}
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix="test_index_"))
+    try:
+        write_project(tmp)
+        sys.path.insert(0, str(tmp))
+        os.chdir(tmp)
+        for name in names:
+            rec = Recorder()
+            pytest.main(["-q", "-p", "no:cacheprovider", "--collect-only", "-k", name, "tests"], plugins=[rec])
+            modules = sorted({nid.split("::", 1)[0] for nid in rec.nodeids})
+            out[name] = {"modules": modules, "nodeids": rec.nodeids}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+def build() -> dict:
+    """Collect in a fresh interpreter so the caller never imports the repo's problems/tests."""
+    proc = subprocess.run([sys.executable, "-m", "eval.selection", "--collect"],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    index = {"digest": index_digest(), "problems": json.loads(proc.stdout.splitlines()[-1])}
+    INDEX.parent.mkdir(parents=True, exist_ok=True)
+    # a temp file of our own: concurrent builders must not rename each other's half-written file
+    with tempfile.NamedTemporaryFile("w", dir=INDEX.parent, prefix="test_index.", suffix=".tmp", delete=False) as f:
+        f.write(json.dumps(index, indent=2))
+    os.replace(f.name, INDEX)
+    return index
+
+def load_index() -> dict:
+    """problem -> {"modules": [tests/...py], "nodeids": [...]}, rebuilt when tests/ or problems/ change."""
+    if INDEX.exists():
+        index = json.loads(INDEX.read_text())
+        if index.get("digest") == index_digest():
+            return index["problems"]
+    return build()["problems"]
+
+def tests_for(problem: str, index: dict | None = None):
+    """Exact (modules, nodeids) that `pytest -k problem` would run, or None if unindexed."""
+    index = load_index() if index is None else index
+    entry = index.get(problem)
+    return None if entry is None else (entry["modules"], entry["nodeids"])
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--collect"]:
+        import io, contextlib
+        with contextlib.redirect_stdout(io.StringIO()):
+            res = _collect(problem_names())
+        print(json.dumps(res))
+    else:
+        print(json.dumps(build(), indent=2))
@@ -0,0 +1,180 @@
+import json, pathlib, sqlite3, sys, argparse
+import numpy as np
+from eval.cache import ROOT
+from eval.results import GROUP_FIELDS, PERF_FIELDS
+
+DB = ROOT / "runs" / "results.sqlite"
+
+RESULT_FIELDS = GROUP_FIELDS + ("sample_id", "passed", "outcome") + PERF_FIELDS
+
+# The primary key doubles as the (problem, model_family, model_name, strategy) index;
+# the model index serves per-model slices across problems.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    problem TEXT NOT NULL, model_family TEXT NOT NULL, model_name TEXT NOT NULL,
+    strategy TEXT NOT NULL, sample_id INTEGER NOT NULL,
+    passed INTEGER NOT NULL, outcome TEXT,
+    runtime_s REAL, cpu_s REAL, peak_kb REAL,
+    program TEXT,
+    PRIMARY KEY (problem, model_family, model_name, strategy, sample_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_model ON results (model_family, model_name, strategy);
+CREATE INDEX IF NOT EXISTS results_program ON results (program);
+CREATE TABLE IF NOT EXISTS xpatch_logs (
+    id INTEGER PRIMARY KEY, problem TEXT, round INTEGER, passed INTEGER, data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS xpatch_logs_problem ON xpatch_logs (problem, round);
+"""
+
+class ResultsStore:
+    """
+    SQLite mirror of results.jsonl (and xpatch_logs.jsonl) for indexed lookups.
+
+    Rows are buffered and inserted `batch` at a time in one transaction; a row
+    with the same (problem, model_family, model_name, strategy, sample_id)
+    replaces the old one. With resume=False the results table is emptied first,
+    like ResultsWriter truncating results.jsonl. `program` is the
+    eval.dedup.program_hash of the sample, when the writer knows it.
+    """
+
+    def __init__(self, path: pathlib.Path = DB, resume: bool = True, batch: int = 512):
+        self.path = pathlib.Path(path)
+        self.batch = max(1, batch)
+        self._rows, self._logs = [], []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA cache_size=-65536")  # 64 MiB: keeps index pages hot during bulk inserts
+        self.conn.executescript(SCHEMA)
+        if not resume:
+            with self.conn:
+                self.conn.execute("DELETE FROM results")
+
+    def write(self, row: dict, program: str | None = None) -> None:
+        self._rows.append(tuple(row.get(f) for f in RESULT_FIELDS) + (program,))
+        if len(self._rows) >= self.batch:
+            self.flush()
+
+    def log(self, entry: dict) -> None:
+        """One xpatch log line."""
+        self._logs.append((entry.get("problem"), entry.get("round"), entry.get("passed"), json.dumps(entry)))
+        if len(self._logs) >= self.batch:
+            self.flush()
+
+    def flush(self) -> None:
+        with self.conn:
+            if self._rows:
+                cols = RESULT_FIELDS + ("program",)
+                self.conn.executemany(f"INSERT OR REPLACE INTO results ({', '.join(cols)}) "
+                                      f"VALUES ({', '.join('?' * len(cols))})", self._rows)
+            if self._logs:
+                self.conn.executemany("INSERT INTO xpatch_logs (problem, round, passed, data) VALUES (?, ?, ?, ?)",
+                                      self._logs)
+        self._rows, self._logs = [], []
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- queries -------------------------------------------------------------
+
+    @staticmethod
+    def _where(filters: dict, allowed) -> tuple[str, list]:
+        unknown = set(filters) - set(allowed)
+        if unknown:
+            raise ValueError(f"cannot filter on {sorted(unknown)}")
+        items = [(k, v) for k, v in filters.items() if v is not None]
+        if not items:
+            return "", []
+        return " WHERE " + " AND ".join(f"{k} = ?" for k, _ in items), [v for _, v in items]
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def iter_rows(self, **filters):
+        """Result rows (results.jsonl shape) matching column=value filters, e.g. problem="two_sum"."""
+        where, params = self._where(filters, RESULT_FIELDS + ("program",))
+        cur = self.conn.execute(f"SELECT {', '.join(RESULT_FIELDS)} FROM results{where} "
+                                f"ORDER BY {', '.join(GROUP_FIELDS)}, sample_id", params)
+        return (dict(r, passed=bool(r["passed"])) for r in cur)
+
+    def query(self, **filters) -> list[dict]:
+        return list(self.iter_rows(**filters))
+
+    def group_counts(self, **filters):
+        """
+        (keys, n, c, perf) per group, as eval_passk.group_stats returns them,
+        computed by SQLite with GROUP BY instead of by scanning rows in Python.
+        """
+        where, params = self._where(filters, RESULT_FIELDS + ("program",))
+        group = ", ".join(GROUP_FIELDS)
+        cur = self.conn.execute(f"SELECT {group}, COUNT(*), SUM(passed), "
+                                + ", ".join(f"AVG({f})" for f in PERF_FIELDS)
+                                + f" FROM results{where} GROUP BY {group} ORDER BY {group}", params)
+        recs = cur.fetchall()
+        keys = [tuple(r[:4]) for r in recs]
+        n = np.array([r[4] for r in recs], dtype=np.int64)
+        c = np.array([r[5] for r in recs], dtype=np.int64)
+        perf = {f: np.array([r[6 + j] for r in recs], dtype=float) for j, f in enumerate(PERF_FIELDS)}
+        return keys, n, c, perf
+
+    def logs(self, **filters) -> list[dict]:
+        where, params = self._where(filters, ("problem", "round", "passed"))
+        return [json.loads(r["data"]) for r in self.conn.execute(f"SELECT data FROM xpatch_logs{where} ORDER BY id", params)]
+
+    # --- JSONL import / export -----------------------------------------------
+
+    def import_jsonl(self, path) -> int:
+        """Load results.jsonl rows; returns the number of rows read."""
+        count = 0
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    self.write(json.loads(line))
+                    count += 1
+        self.flush()
+        return count
+
+    def import_logs(self, path) -> int:
+        count = 0
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    self.log(json.loads(line))
+                    count += 1
+        self.flush()
+        return count
+
+    def export_jsonl(self, out, **filters) -> int:
+        """Write matching rows as results.jsonl lines to the file object `out`."""
+        count = 0
+        for row in self.iter_rows(**filters):
+            out.write(json.dumps(row) + "\n")
+            count += 1
+        return count
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="SQLite results store")
+    ap.add_argument("--db", default=str(DB))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("import").add_argument("path", nargs="?", default=str(ROOT / "runs" / "results.jsonl"))
+    sub.add_parser("import-logs").add_argument("path", nargs="?", default=str(ROOT / "runs" / "xpatch_logs.jsonl"))
+    exp = sub.add_parser("export", help="print matching rows as results.jsonl lines")
+    for f in GROUP_FIELDS + ("program",):
+        exp.add_argument(f"--{f}")
+    args = ap.parse_args()
+    with ResultsStore(args.db) as store:
+        if args.cmd == "import":
+            print(f"imported {store.import_jsonl(args.path)} rows into {args.db}", file=sys.stderr)
+        elif args.cmd == "import-logs":
+            print(f"imported {store.import_logs(args.path)} log lines into {args.db}", file=sys.stderr)
+        else:
+            store.export_jsonl(sys.stdout, **{f: getattr(args, f) for f in GROUP_FIELDS + ("program",)})
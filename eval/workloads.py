@@ -0,0 +1,87 @@
+import copy, hashlib, json, pathlib, random, time, tracemalloc
+from eval.cache import ROOT
+
+def _roman(n: int) -> str:
+    out = []
+    for v, s in ((1000, "M"), (900, "CM"), (500, "D"), (400, "CD"), (100, "C"), (90, "XC"),
+                 (50, "L"), (40, "XL"), (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I")):
+        while n >= v:
+            out.append(s)
+            n -= v
+    return "".join(out)
+
+def _intervals(rng: random.Random, n: int) -> list[list[int]]:
+    return [[s, s + rng.randint(0, 50)] for s in rng.sample(range(10**6), n)]
+
+def _words(rng: random.Random, n: int) -> list[str]:
+    return ["".join(rng.choice("abcdefghij") for _ in range(rng.randint(1, 12))) for _ in range(n)]
+
+# problem -> zero-arg factory returning the list of argument tuples of the standard workload.
+# Sizes are chosen so a linear-ish solution takes milliseconds and a naive one is clearly slower,
+# while still finishing inside the default CPU limit.
+WORKLOADS = {
+    "two_sum": lambda: [(list(range(5000)), 9997)],
+    "is_anagram": lambda: [("A decimal point! " * 3000, "I'm a dot in place. " * 3000)],
+    "roman_to_int": lambda: [(_roman(n),) for n in range(1, 4000)],
+    "longest_common_prefix": lambda: [(["p" * 500 + str(i).zfill(20) for i in range(200)],)],
+    "valid_parentheses": lambda: [("([{" * 30000 + "}])" * 30000,), ("(" * 60000 + "]",)],
+    "rotate_matrix_90_clockwise": lambda: [([[r * 200 + c for c in range(200)] for r in range(200)],)],
+    "merge_intervals": lambda: [(_intervals(random.Random(7), 20000),)],
+    "nth_fib": lambda: [(n,) for n in range(28)],
+    "sum_of_primes_upto": lambda: [(100000,)],
+    "word_wrap": lambda: [(" ".join(_words(random.Random(11), 20000)), 40)],
+}
+
+def workloads_digest() -> str:
+    """Changes whenever this file does; part of the evaluation cache key."""
+    return hashlib.sha256(pathlib.Path(__file__).read_bytes()).hexdigest()
+
+def fresh_candidate(gen_code: str, filename: str, problem: str, base: dict):
+    """The problem's function from gen_code exec'd over a copy of the base problems.py globals."""
+    ns = dict(base)
+    exec(compile(gen_code, filename, "exec"), ns)
+    return ns[problem]
+
+def measure(load, problem: str) -> dict | None:
+    """
+    Wall time and CPU time of load() over the problem's workload, then its
+    tracemalloc peak on a second pass (tracing slows the timed pass down, so
+    the two are kept apart). load() must return a freshly exec'd candidate
+    (see fresh_candidate) and is called once per pass, so neither pass sees
+    a cache a memoizing candidate filled earlier. None if there is no
+    workload or the candidate raises on it.
+    """
+    factory = WORKLOADS.get(problem)
+    if factory is None:
+        return None
+    calls = factory()
+    timed, traced = copy.deepcopy(calls), calls
+    try:
+        fn = load()
+        t0, c0 = time.perf_counter(), time.process_time()
+        for args in timed:
+            fn(*args)
+        wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+        fn = load()
+        tracemalloc.start()
+        try:
+            for args in traced:
+                fn(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    except Exception:
+        return None
+    return {"runtime_s": round(wall, 6), "cpu_s": round(cpu, 6), "peak_kb": round(peak / 1024, 1)}
+
+if __name__ == "__main__":
+    # python -m eval.workloads --problem P --sample_path S: measure a candidate in a fresh namespace
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--problem", required=True)
+    ap.add_argument("--sample_path", required=True)
+    args = ap.parse_args()
+    ns = {"__name__": "problems.problems"}
+    exec(compile((ROOT / "problems" / "problems.py").read_text(), "problems/problems.py", "exec"), ns)
+    gen_code = pathlib.Path(args.sample_path).read_text()
+    print(json.dumps(measure(lambda: fresh_candidate(gen_code, args.sample_path, args.problem, ns), args.problem)))
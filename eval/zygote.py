@@ -0,0 +1,168 @@
+import os, sys, io, json, time, select, shutil, signal, tempfile, pathlib, contextlib
+from eval.run_and_score import (write_project, pytest_selection, apply_limits, outcome_from_signal,
+                                DEFAULT_LIMITS, PASSED, FAILED, TIMEOUT, OOM)
+from eval.selection import load_index
+from eval.fastpath import load_tables, run_table
+from eval.workloads import measure, fresh_candidate
+
+# grace on top of wall_s before the parent kills a child its own SIGALRM did not stop
+WALL_MARGIN_S = 2.0
+
+class _MemoryErrorWatch:
+    """pytest plugin: notes whether any test raised MemoryError (i.e. hit RLIMIT_AS)."""
+    seen = False
+
+    def pytest_exception_interact(self, node, call, report):
+        if call.excinfo is not None and call.excinfo.errisinstance(MemoryError):
+            self.seen = True
+
+class Zygote:
+    """
+    Long-lived evaluator that pays interpreter, pytest and collection start-up once.
+
+    On construction it lays out one temp project with the *base* problems.py,
+    puts it first on sys.path and runs a pytest --collect-only pass so pytest,
+    its plugins, problems.problems and every (assertion-rewritten) test module
+    sit in sys.modules. Each candidate then runs in a fork()ed copy-on-write
+    child: the override is exec'd into problems.problems, names the test
+    modules imported from it are rebound, and pytest runs against the cached
+    modules. The child reports back over a pipe; the zygote stays clean.
+
+    Children only run the node ids eval.selection maps the problem to, under
+    the rlimits from run_and_score.apply_limits plus a SIGALRM wall timer.
+    With fastpath, problems whose tests are plain literal asserts skip pytest
+    and replay eval.fastpath's table against the candidate instead.
+
+    Must be created in a process that has not imported the repo's `problems`.
+    """
+
+    def __init__(self, base_dir: str | None = None, fastpath: bool = True, index: dict | None = None):
+        import pytest
+        self.index = load_index() if index is None else index
+        self.tables = load_tables(self.index) if fastpath else {}
+        self.workdir = pathlib.Path(tempfile.mkdtemp(prefix="zygote_", dir=base_dir))
+        write_project(self.workdir)
+        sys.path.insert(0, str(self.workdir))
+        os.chdir(self.workdir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pytest.main(["-q", "-p", "no:cacheprovider", "--collect-only", "tests"])
+        self.pytest = pytest
+
+    def run(self, problem_name: str, py_path: str, limits: dict | None = None, perf: bool = False):
+        """
+        Score one candidate; returns (outcome, measurements) where outcome is
+        PASSED, FAILED, TIMEOUT or OOM and measurements is eval.workloads.measure()
+        of a passing candidate when perf is set (None otherwise or if it did not finish).
+        """
+        limits = DEFAULT_LIMITS if limits is None else limits
+        gen_code = pathlib.Path(py_path).read_text()
+        _, selection = pytest_selection(problem_name, self.index)
+        if not selection:
+            return FAILED, None
+        rfd, wfd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(rfd)
+            try:
+                devnull = os.open(os.devnull, os.O_WRONLY)
+                os.dup2(devnull, 1)
+                os.dup2(devnull, 2)
+                apply_limits(limits)
+                if limits.get("wall_s"):
+                    signal.setitimer(signal.ITIMER_REAL, limits["wall_s"])
+                # pristine base globals: the tests below exec the candidate into problems.problems and warm it up
+                base = dict(vars(sys.modules["problems.problems"]))
+                _, outcome = self._score(problem_name, gen_code, py_path, selection)
+                # the verdict goes out first: a workload that blows the limits only loses the measurements
+                os.write(wfd, (json.dumps(outcome) + "\n").encode())
+                if perf and outcome == PASSED:
+                    load = lambda: fresh_candidate(gen_code, py_path, problem_name, base)
+                    os.write(wfd, (json.dumps(measure(load, problem_name)) + "\n").encode())
+            finally:
+                os._exit(0)
+        os.close(wfd)
+        data, killed = self._read(rfd, pid, limits["wall_s"] + WALL_MARGIN_S if limits.get("wall_s") else None)
+        lines = data.splitlines()
+        _, status = os.waitpid(pid, 0)
+        if not lines:
+            if killed:
+                return TIMEOUT, None
+            if os.WIFSIGNALED(status):
+                return outcome_from_signal(os.WTERMSIG(status)), None
+            return FAILED, None
+        return json.loads(lines[0]), (json.loads(lines[1]) if len(lines) > 1 else None)
+
+    @staticmethod
+    def _read(rfd: int, pid: int, wall_s: float | None) -> tuple[bytes, bool]:
+        """
+        Everything the child writes to rfd, and whether it had to be SIGKILLed:
+        a child that ignores its SIGALRM (or leaves a grandchild holding the
+        pipe open) never sends EOF, so the parent stops waiting after wall_s.
+        """
+        deadline = None if wall_s is None else time.monotonic() + wall_s
+        chunks, killed = [], False
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not select.select([rfd], [], [], timeout)[0]:
+                    os.kill(pid, signal.SIGKILL)
+                    killed = True
+                    break
+                chunk = os.read(rfd, 1 << 16)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        finally:
+            os.close(rfd)
+        return b"".join(chunks), killed
+
+    def _score(self, problem_name, gen_code, py_path, selection):
+        """Runs in the child: (candidate namespace, outcome)."""
+        try:
+            if problem_name in self.tables:
+                ns = dict(vars(sys.modules["problems.problems"]))
+                return ns, run_table(self.tables[problem_name], gen_code, py_path, ns)
+            watch = _MemoryErrorWatch()
+            self._inject(gen_code, py_path)
+            rc = self.pytest.main(["-q", "-p", "no:cacheprovider", *selection], plugins=[watch])
+            ns = vars(sys.modules["problems.problems"])
+            return ns, OOM if watch.seen else PASSED if rc == 0 else FAILED
+        except MemoryError:
+            return {}, OOM
+        except BaseException:
+            return {}, FAILED
+
+    def close(self) -> None:
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    @staticmethod
+    def _inject(gen_code: str, filename: str) -> None:
+        mod = sys.modules["problems.problems"]
+        before = dict(vars(mod))
+        exec(compile(gen_code, filename, "exec"), vars(mod))
+        # test modules did `from problems.problems import f` at import time; rebind those names
+        for name, tmod in list(sys.modules.items()):
+            if not name.startswith("tests.") or tmod is None:
+                continue
+            for attr, val in list(vars(tmod).items()):
+                if attr in before and val is before[attr]:
+                    setattr(tmod, attr, getattr(mod, attr))
+
+def serve(stdin=sys.stdin, stdout=sys.stdout):
+    """JSON-lines loop: {"problem", "sample_path"} in, the same plus "outcome" and "pass" out."""
+    cwd = pathlib.Path.cwd()
+    z = Zygote()
+    try:
+        for line in stdin:
+            if not line.strip():
+                continue
+            req = json.loads(line)
+            req["outcome"], _ = z.run(req["problem"], str(cwd / req["sample_path"]))
+            req["pass"] = req["outcome"] == PASSED
+            stdout.write(json.dumps(req) + "\n")
+            stdout.flush()
+    finally:
+        z.close()
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,105 @@
+import argparse, contextlib, io, json, math, os, pathlib, time
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.llm_stand_in import serve, add_stand_in_args, stand_in_from_args
+
+STAGES = ("generate", "gen_tests", "xpatch")
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))]
+
+def timed(fn, item):
+    t0 = time.perf_counter()
+    try:
+        ok = bool(fn(item))
+    except Exception:
+        ok = False
+    return time.perf_counter() - t0, ok
+
+def run_stage(name: str, fn, items, workers: int) -> dict:
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        results = list(pool.map(lambda item: timed(fn, item), items))
+    wall = time.perf_counter() - t0
+    lat = [s for s, _ in results]
+    return {"stage": name, "items": len(items), "failed": sum(not ok for _, ok in results),
+            "wall_s": round(wall, 3), "per_s": round(len(items) / wall, 2) if wall else None,
+            "p50_s": round(percentile(lat, 50), 3) if lat else None,
+            "p99_s": round(percentile(lat, 99), 3) if lat else None}
+
+def build_stages(args) -> dict:
+    """stage -> (fn(item) -> success, items), over the real generator / xpatch code paths."""
+    from scripts import generate_samples_llama as gl, gen_tests_ollama as gt, xpatch as xp
+    from scripts.ollama_client import get_client
+    problems = args.problems.split(",") if args.problems else sorted(gl.PROBLEMS)
+
+    def generate(item):
+        prob, strat, i = item
+        meta = gl.PROBLEMS[prob]
+        code = gl.extract_code(gl.llama_generate(gl.build_prompt(meta["task"], meta["signature"], gl.STRATEGIES[strat]),
+                                                 model=args.model, variant=i))
+        return code and gl.compilable(code)
+
+    def gen_tests(item):
+        prob, i = item
+        return gt.fenced(get_client().generate(args.model, gt.build_prompt(prob), variant=i))
+
+    def xpatch(prob):
+        rows = xp.run_xpatch(prob, "llama", args.model, "llama", args.model, args.rounds, emit=lambda row: None)
+        return rows and "error" not in rows[0]
+
+    return {
+        "generate": (generate, [(p, s, i) for p in problems for s in gl.STRATEGIES for i in range(args.n)]),
+        "gen_tests": (gen_tests, [(p, i) for p in gt.ALL_PROBLEMS for i in range(args.n)]),
+        "xpatch": (xpatch, [p for p in problems if p in xp.PROBLEMS]),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="End-to-end throughput of the LLM pipeline against a local stand-in")
+    ap.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {','.join(STAGES)}")
+    ap.add_argument("--problems", default=None, help="comma-separated problems (default: all)")
+    ap.add_argument("--n", type=int, default=2, help="samples per (problem, strategy) / tests per problem")
+    ap.add_argument("--rounds", type=int, default=1, help="xpatch examiner rounds")
+    ap.add_argument("--model", default="stand-in")
+    ap.add_argument("-j", "--concurrency", type=int, default=4, help="items in flight per stage")
+    ap.add_argument("--ollama-host", default=None, help="benchmark this server instead of starting a stand-in")
+    ap.add_argument("--cache", action="store_true", help="leave the LLM response cache on (default: off)")
+    ap.add_argument("--json", default=None, help="also write the report here")
+    add_stand_in_args(ap)
+    args = ap.parse_args()
+
+    stand_in = None
+    if args.ollama_host is None:
+        stand_in = stand_in_from_args(args)
+        server = serve(stand_in)
+        args.ollama_host = f"http://127.0.0.1:{server.server_address[1]}"
+    # the shared client and cache read these on first use
+    os.environ["OLLAMA_HOST"] = args.ollama_host
+    os.environ["OLLAMA_WORKERS"] = str(args.concurrency)
+    if not args.cache:
+        os.environ["LLM_CACHE"] = "off"
+
+    stages = build_stages(args)
+    report, t0 = [], time.perf_counter()
+    for name in args.stages.split(","):
+        fn, items = stages[name]
+        with contextlib.redirect_stderr(io.StringIO()):   # per-round progress from xpatch
+            report.append(run_stage(name, fn, items, args.concurrency))
+        r = report[-1]
+        print(f"{name:<10} {r['items']:>5} items  {r['failed']:>3} failed  {r['wall_s']:>8.2f}s  "
+              f"{r['per_s']:>7.2f}/s  p50 {r['p50_s']:.3f}s  p99 {r['p99_s']:.3f}s")
+    total = time.perf_counter() - t0
+    items = sum(r["items"] for r in report)
+    print(f"{'total':<10} {items:>5} items  {total:>26.2f}s  {items / total:>7.2f}/s")
+
+    from scripts.ollama_client import get_client
+    summary = {"stages": report, "total_s": round(total, 3), "client": get_client().usage,
+               "server": stand_in.stats if stand_in else None}
+    print(json.dumps({"client": summary["client"], "server": summary["server"]}))
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import re, pathlib
+import xml.etree.ElementTree as ET
+
+DEFAULT_TOKENS = 400   # ~4 chars/token, like the rate limiter's estimates
+FIELD_CHARS = 240      # cap per field, so one huge repr cannot eat the budget
+STOPPED = re.compile(r"stopping after \d+ failures")
+
+def node_id(case, workdir: pathlib.Path):
+    """pytest node id of a junit <testcase>, or None (e.g. a collection error)."""
+    # classname is the dotted module path plus any test classes, e.g. tests.test_x.TestFoo
+    parts = case.get("classname", "").split(".")
+    for i in range(len(parts), 0, -1):
+        path = "/".join(parts[:i]) + ".py"
+        if (workdir / path).exists():
+            return "::".join([path, *parts[i:], case.get("name", "")])
+    return None
+
+def _clip(text: str, limit: int = FIELD_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def _call(line: str, func: str):
+    """The `func(...)` call expression in a source line, parentheses balanced."""
+    m = re.search(rf"(?<![\w.]){re.escape(func)}\(", line)
+    if m is None or line.lstrip().startswith("def "):
+        return None
+    start = m.start()
+    depth = 0
+    for i in range(start + len(func), len(line)):
+        depth += {"(": 1, ")": -1}.get(line[i], 0)
+        if depth == 0:
+            return line[start:i + 1]
+    return line[start:]
+
+def _split_assert(expr: str):
+    """'A == B' -> (A, op, B) at the top level of an assert expression, else None."""
+    depth, quote, i = 0, None, 0
+    while i < len(expr):
+        ch = expr[i]
+        if quote:
+            quote = None if ch == quote and expr[i - 1] != "\\" else quote
+        elif ch in "'\"":
+            quote = ch
+        elif ch in "([{":
+            depth += 1
+        elif ch in ")]}":
+            depth -= 1
+        elif depth == 0:
+            m = re.match(r"\s*(==|!=|<=|>=|not in|in|is not|is|<|>)\s", expr[i:])
+            if m and (expr[i] == " " or expr[i] in "=!<>"):
+                return expr[:i].strip(), m.group(1), expr[i + m.end():].strip()
+        i += 1
+    return None
+
+def describe(text: str, message: str, func: str) -> dict:
+    """call / check / expected / actual / error of one failure's long repr."""
+    lines = text.splitlines()
+    body = [l for l in lines if not l.startswith("E ")]
+    errors = [l[1:].strip() for l in lines if l.startswith("E ")]
+    info = {}
+    failing = next((l[1:].strip() for l in lines if l.startswith(">")), "")
+    # the test's call into the candidate: the one on the failing line, else the first in the test body
+    call = _call(failing, func) or next((c for c in map(lambda l: _call(l, func), body) if c), None)
+    # pytest shows the argument values of each frame just above its `def`
+    at = next((i for i, l in enumerate(lines) if f"def {func}(" in l), None)
+    above = [l.strip() for l in lines[:at] if l.strip()] if at else []
+    frame = above[-1] if above and re.match(r"^\w+ = ", above[-1]) else None
+    if call:
+        names = set(re.findall(r"\b([A-Za-z_]\w*)\b", call[len(func):]))
+        binds = [b.split("  #")[0].strip() for b in body for n in names if re.match(rf"^\s*>?\s*{n}\s*=\s*(?!=)", b)]
+        info["call"] = call + (f"  with {'; '.join(binds)}" if binds and not frame else "")
+    if frame:
+        info["args"] = frame
+    if failing and failing != call:
+        info["check"] = failing
+    last = lines[-1] if lines else ""   # e.g. problems/problems.py:12: KeyError
+    m = re.match(r"^([\w.]+)(?::|$)", message) or re.search(r":\d+: ([\w.]+)$", last)
+    info["error"] = m.group(1) if m else "Error"
+    head = (message or (errors[0] if errors else "")).split("\n")[0]
+    m = re.match(r"^AssertionError: assert (.*)$", head)
+    parts = _split_assert(m.group(1)) if m else None
+    if parts:
+        left, op, right = parts
+        # pytest prints a string diff as '- expected' / '+ actual' lines, untruncated
+        minus = [e[2:] for e in errors if e.startswith("- ")]
+        plus = [e[2:] for e in errors if e.startswith("+ ")]
+        if op == "==" and len(minus) == 1 and len(plus) == 1:
+            left, right = repr(plus[0]), repr(minus[0])
+        info["actual"] = left
+        info["expected"] = right if op == "==" else f"{op} {right}"
+    elif head:
+        info["message"] = head
+    return info
+
+def digest(report: pathlib.Path, workdir: pathlib.Path, func: str, raw: str = "", tokens: int = DEFAULT_TOKENS) -> str:
+    """
+    Compact summary of the failures in a --junitxml report: per failing test
+    its node id, the call into `func` (with argument values when the
+    candidate raised), the failing check, expected vs actual and the
+    exception type. Stops at `tokens` (~4 chars each) and says how many
+    failures it left out. Falls back to the tail of `raw` pytest output when
+    the report has no usable failures (collection errors, timeouts).
+    """
+    budget = max(1, tokens) * 4
+    try:
+        cases = list(ET.parse(report).getroot().iter("testcase"))
+    except (OSError, ET.ParseError):
+        cases = []
+    blocks, seen = [], set()
+    for case in cases:
+        bad = next((c for c in case if c.tag in ("failure", "error")), None)
+        if bad is None:
+            continue
+        node = node_id(case, workdir)
+        if node is None and STOPPED.search(f"{bad.get('message', '')}\n{bad.text or ''}"):
+            continue   # -x ending the session mid-collection, not a failure of the candidate
+        if node is None:
+            # a module that failed to import, typically a syntax error in the candidate: its E lines say why
+            detail = " | ".join(l[1:].strip() for l in (bad.text or "").splitlines() if l.startswith("E ") and l[1:].strip())
+            detail = detail.replace(f"{workdir}/", "")   # keep the prompt (and its cache key) free of temp paths
+            if detail in seen:
+                continue
+            seen.add(detail)
+            blocks.append(f"ERROR collecting {case.get('name', '')}\n  error: {_clip(detail or bad.get('message', ''), FIELD_CHARS * 2)}")
+            continue
+        info = describe(bad.text or "", bad.get("message", ""), func)
+        blocks.append("\n".join([f"FAILED {node}", *(f"  {k}: {_clip(v)}" for k, v in info.items())]))
+    if not blocks:
+        return raw[-budget:]
+    out, used = [], 0
+    for i, block in enumerate(blocks):
+        if out and used + len(block) + 1 > budget:
+            out.append(f"... and {len(blocks) - i} more failing tests")
+            break
+        out.append(block[:budget])
+        used += len(block) + 1
+    return "\n".join(out)
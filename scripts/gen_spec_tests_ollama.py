@@ -1,8 +1,9 @@
-import subprocess
 import sys
 import pathlib
 import re
 
+from scripts.ollama_client import get_client
+
 # You can change the default model if needed
 DEFAULT_MODEL = "llama3.r2"
 
@@ -95,18 +96,11 @@ assert all(line != "" for line in lines)""",
 
 
 def run_ollama(prompt: str, model: str, timeout_sec: int = 600) -> str:
-    """Call `ollama run <model>` with the given prompt and return the text output.
+    """Generate with the shared Ollama client and return the fenced code (or the whole text).
 
-    This expects Ollama to be installed and the model to be available locally.
+    This expects an Ollama server with the model available locally.
     """
-    res = subprocess.run(
-        ["ollama", "run", model],
-        input=prompt,
-        text=True,
-        capture_output=True,
-        timeout=timeout_sec,
-    )
-    txt = (res.stdout or "").strip()
+    txt = get_client().generate(model, prompt, timeout=timeout_sec).strip()
     m = FENCE.search(txt)
     return (m.group(1) if m else txt).strip()
 
@@ -1,5 +1,7 @@
 # scripts/gen_tests_ollama.py
-import subprocess, sys, pathlib, re
+import sys, pathlib, re
+
+from scripts.ollama_client import get_client
 
 PROMPT_TMPL = """You are a Python unit-test generator.
 
@@ -57,22 +59,24 @@ Also include nested valid: "{[]}" -> True and mixed valids like "()[]{}". """,
 ALL_PROBLEMS = ["longest_common_prefix", "valid_parentheses"]
 
 def run_ollama(prompt: str, model: str, timeout_sec: int = 600) -> str:
-    res = subprocess.run(
-        ["ollama", "run", model],
-        input=prompt, text=True, capture_output=True, timeout=timeout_sec
-    )
-    txt = (res.stdout or "").strip()
+    return fenced(get_client().generate(model, prompt, timeout=timeout_sec))
+
+def fenced(txt: str) -> str:
+    txt = txt.strip()
     m = FENCE.search(txt)
     return (m.group(1) if m else txt).strip()
 
-def emit_for_problem(prob: str, outfile: pathlib.Path, model: str):
-    prompt = PROMPT_TMPL.format(
+def build_prompt(prob: str) -> str:
+    return PROMPT_TMPL.format(
         func=prob,
         sig=SIG[prob],
         import_line=IMPORT[prob],
         hints=HINTS[prob]
     )
-    code = run_ollama(prompt, model=model)
+
+def emit_for_problem(prob: str, outfile: pathlib.Path, model: str, code: str | None = None):
+    if code is None:
+        code = run_ollama(build_prompt(prob), model=model)
     # safety: prepend the required import if the model forgot it
     if IMPORT[prob] not in code:
         code = f"{IMPORT[prob]}\n\n{code}"
@@ -82,11 +86,11 @@ def emit_for_problem(prob: str, outfile: pathlib.Path, model: str):
 
 def main():
     if len(sys.argv) < 3:
-        print("Usage: python scripts/gen_tests_ollama.py <longest_common_prefix|valid_parentheses|ALL> <outfile or DIR> [model]")
+        print("Usage: python -m scripts.gen_tests_ollama <longest_common_prefix|valid_parentheses|ALL> <outfile or DIR> [model]")
         print("Examples:")
-        print("  python scripts/gen_tests_ollama.py longest_common_prefix tests/test_ext_lcp_iter1.py llama3.2")
-        print("  python scripts/gen_tests_ollama.py valid_parentheses tests/test_ext_validpar_iter1.py llama3.2")
-        print("  python scripts/gen_tests_ollama.py ALL tests/ qwen2.5:7b-instruct")
+        print("  python -m scripts.gen_tests_ollama longest_common_prefix tests/test_ext_lcp_iter1.py llama3.2")
+        print("  python -m scripts.gen_tests_ollama valid_parentheses tests/test_ext_validpar_iter1.py llama3.2")
+        print("  python -m scripts.gen_tests_ollama ALL tests/ qwen2.5:7b-instruct")
         sys.exit(1)
 
     sel = sys.argv[1]
@@ -97,8 +101,10 @@ def main():
         if out_arg.suffix:
             print("When using ALL, provide a directory for the second arg.", file=sys.stderr)
             sys.exit(2)
-        for p in ALL_PROBLEMS:
-            emit_for_problem(p, out_arg / f"test_ext_{p}_iter1.py", model)
+        # all problems are generated concurrently on the shared client's pool
+        futures = {p: get_client().submit(model, build_prompt(p), timeout=600) for p in ALL_PROBLEMS}
+        for p, fut in futures.items():
+            emit_for_problem(p, out_arg / f"test_ext_{p}_iter1.py", model, fenced(fut.result()))
     else:
         if sel not in ALL_PROBLEMS:
             print(f"Unknown problem '{sel}'. Choose from: {', '.join(ALL_PROBLEMS)} or ALL")
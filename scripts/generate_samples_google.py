@@ -1,5 +1,10 @@
-import os, pathlib, time, re, sys, argparse
+import os, pathlib, re, sys, argparse, asyncio
 import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted
+from scripts.rate_limit import RateLimiter
+from scripts.llm_cache import get_cache, add_cache_args, apply_cache_args
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
 
 
 DEFAULT_PRIMARY_MODEL  = "models/gemini-2.5-flash"
@@ -7,8 +12,12 @@ DEFAULT_FALLBACK_MODEL = "models/gemini-2.5-flash"
 DEFAULT_TEMPERATURE    = 0.2
 DEFAULT_N_SAMPLES      = 2
 MAX_TOKENS             = 2000
-DEFAULT_RETRIES        = 1        
-DEFAULT_SLEEP_SECONDS  = 35        
+DEFAULT_RETRIES        = 1
+DEFAULT_RPM            = 10       # free-tier gemini-2.5-flash quota
+DEFAULT_TPM            = 250_000
+DEFAULT_CONCURRENCY    = 8
+DEFAULT_CANDIDATES     = 1        # >1: one request returns several samples of the same prompt
+MAX_THROTTLES          = 8        # 429s tolerated per model before giving up on it
 
 
 PROBLEMS = {
@@ -114,6 +123,19 @@ def response_to_text(resp):
     except Exception as e:
         return "", f"exception:{e}"
 
+def candidates_to_texts(resp):
+    """(text, finish_reason) of every candidate of a candidate_count > 1 response, in order."""
+    try:
+        out = []
+        for cand in getattr(resp, "candidates", None) or []:
+            parts = getattr(cand, "content", None)
+            parts = getattr(parts, "parts", []) if parts else []
+            text = "\n".join(t for t in (getattr(p, "text", None) for p in parts) if t)
+            out.append((text.strip(), str(getattr(cand, "finish_reason", None))))
+        return out
+    except Exception as e:
+        return [("", f"exception:{e}")]
+
 def build_prompt(task, signature, strategy_note):
     return f"""{BASE_TASK}
 
@@ -127,29 +149,103 @@ Function signature:
 {signature}
 """
 
-def generate_with_model(model_name: str, prompt: str, temperature: float):
+def estimate_tokens(prompt: str, count: int = 1) -> int:
+    """
+    Reservation against the TPM bucket before the call: ~4 chars/token in,
+    worst case out per candidate. The prompt is only paid once per request.
+    """
+    return len(prompt) // 4 + MAX_TOKENS * count
+
+async def generate_with_model(model_name: str, prompt: str, temperature: float, count: int = 1):
+    """([(text, finish)] for `count` candidates of one request, total tokens used)."""
     model = genai.GenerativeModel(model_name)
-    resp = model.generate_content(
-        prompt,
-        generation_config={
-            "temperature": temperature,
-            "max_output_tokens": MAX_TOKENS,
-            "response_mime_type": "text/plain",
-        },
-        request_options={"timeout": 90},
-    )
-    text, finish = response_to_text(resp)
-    return (text or "").strip(), str(finish)
-
-def try_models(prompt: str, primary_model: str, fallback_model: str, retries: int,
-               sleep_between_calls: int, temperature: float):
+    config = {
+        "temperature": temperature,
+        "max_output_tokens": MAX_TOKENS,
+        "response_mime_type": "text/plain",
+    }
+    if count > 1:
+        config["candidate_count"] = count
+    resp = await model.generate_content_async(prompt, generation_config=config, request_options={"timeout": 90})
+    if count > 1:
+        cands = candidates_to_texts(resp)
+    else:
+        text, finish = response_to_text(resp)
+        cands = [((text or "").strip(), str(finish))]
+    used = getattr(getattr(resp, "usage_metadata", None), "total_token_count", 0) or 0
+    return cands, used
+
+async def try_models(prompt: str, primary_model: str, fallback_model: str, retries: int,
+                     temperature: float, limiter: RateLimiter, variants=(None,)):
+    """
+    {variant: (model, text, finish)} for the samples `variants` (sample indices)
+    that produced text; all still missing ones are asked for in one request
+    with candidate_count = how many are missing.
+
+    Waits for quota instead of sleeping a fixed time after every call. A 429
+    pauses every in-flight task via the limiter and does not use up a retry.
+    Cached responses (keyed by variant) skip the quota entirely.
+    """
+    cache = get_cache()
+    got = {}
     for model_name in (primary_model, fallback_model):
-        for _ in range(retries + 1):
-            text, finish = generate_with_model(model_name, prompt, temperature=temperature)
-            time.sleep(sleep_between_calls)  # help avoid 429 on free tier
-            if text:
-                return model_name, text, finish
-    return None, "", "no_text_after_retries"
+        options = {"temperature": temperature, "max_output_tokens": MAX_TOKENS}
+        keys = {v: cache.key("google", model_name, prompt, options, v) for v in variants if v not in got}
+        for v, key in keys.items():
+            hit = cache.get(key)
+            if hit is not None:
+                got[v] = (model_name, hit["text"], hit["finish"])
+        attempts = throttles = 0
+        while attempts <= retries and throttles <= MAX_THROTTLES:
+            want = [v for v in keys if v not in got]
+            if not want:
+                break
+            reserved = estimate_tokens(prompt, len(want))
+            await limiter.aacquire(reserved)
+            try:
+                cands, used = await generate_with_model(model_name, prompt, temperature=temperature, count=len(want))
+            except ResourceExhausted:
+                limiter.throttled()
+                throttles += 1
+                continue
+            except Exception as e:
+                print(f"[WARN] {model_name}: {e}", file=sys.stderr)
+                attempts += 1
+                continue
+            limiter.succeeded()
+            limiter.settle(reserved, used)
+            attempts += 1
+            for v, (text, finish) in zip(want, [c for c in cands if c[0]]):
+                cache.put(keys[v], {"text": text, "finish": finish})
+                got[v] = (model_name, text, finish)
+    return got
+
+async def run_jobs(jobs, args, out_root: pathlib.Path):
+    limiter = RateLimiter(rpm=args.rpm, tpm=args.tpm)
+    slots = asyncio.Semaphore(max(1, args.concurrency))
+
+    async def one(prob, strat_key, prompt, indices):
+        async with slots:
+            got = await try_models(
+                prompt,
+                primary_model=args.model,
+                fallback_model=args.fallback_model,
+                retries=int(args.retries),
+                temperature=float(args.temperature),
+                limiter=limiter,
+                variants=indices,
+            )
+        for i in indices:
+            if i not in got:
+                print(f"[ERROR] No usable text for {prob} / {strat_key} / sample_{i}. Skipping.", file=sys.stderr)
+                continue
+            model_used, text, finish = got[i]
+            code = extract_code_block(text)
+            out_dir = out_root / prob / f"google-{model_used.replace('/', '_')}" / strat_key
+            out_dir.mkdir(parents=True, exist_ok=True)
+            (out_dir / f"sample_{i}.py").write_text(code)
+
+    await asyncio.gather(*(one(*job) for job in jobs))
 
 def main():
     ap = argparse.ArgumentParser()
@@ -158,10 +254,16 @@ def main():
     ap.add_argument("--n", type=int, default=DEFAULT_N_SAMPLES, help="num samples")
     ap.add_argument("--model", default=DEFAULT_PRIMARY_MODEL, help="primary model id")
     ap.add_argument("--fallback_model", default=DEFAULT_FALLBACK_MODEL, help="fallback model id")
-    ap.add_argument("--sleep", type=int, default=DEFAULT_SLEEP_SECONDS, help="seconds between calls")
+    ap.add_argument("--rpm", type=float, default=DEFAULT_RPM, help="requests per minute (0 = unlimited)")
+    ap.add_argument("--tpm", type=float, default=DEFAULT_TPM, help="tokens per minute (0 = unlimited)")
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="max requests in flight")
+    ap.add_argument("--candidates", type=int, default=DEFAULT_CANDIDATES,
+                    help="samples requested per call via candidate_count (Gemini allows up to 8)")
     ap.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE, help="sampling temperature")
     ap.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="retries per model")
+    add_cache_args(ap)
     args = ap.parse_args()
+    apply_cache_args(args)
 
     assert os.environ.get("GOOGLE_API_KEY"), "Set GOOGLE_API_KEY"
     genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
@@ -169,31 +271,19 @@ def main():
     problems_to_run = {args.problem: PROBLEMS[args.problem]} if args.problem else PROBLEMS
     strategies_to_run = {args.strategy: STRATEGIES[args.strategy]} if args.strategy else STRATEGIES
 
-    root = pathlib.Path(__file__).resolve().parents[1]
-    out_root = root / "runs" / "raw_generations"
+    out_root = ROOT / "runs" / "raw_generations"
     out_root.mkdir(parents=True, exist_ok=True)
 
+    jobs = []
     for prob, meta in problems_to_run.items():
         for strat_key, strat_note in strategies_to_run.items():
-            for i in range(int(args.n)):
-                prompt = build_prompt(meta["task"], meta["signature"], strat_note)
-                if args.strategy == "debug_hint":
-                    prompt = prompt + "\n" + DEBUG_HINTS.get(args.problem, "")
-                model_used, text, finish = try_models(
-                    prompt,
-                    primary_model=args.model,
-                    fallback_model=args.fallback_model,
-                    retries=int(args.retries),
-                    sleep_between_calls=int(args.sleep),
-                    temperature=float(args.temperature),
-                )
-                if not text:
-                    print(f"[ERROR] No usable text for {prob} / {strat_key} / sample_{i} (finish={finish}). Skipping.", file=sys.stderr)
-                    continue
-                code = extract_code_block(text)
-                out_dir = out_root / prob / f"google-{(model_used or args.model).replace('/', '_')}" / strat_key
-                out_dir.mkdir(parents=True, exist_ok=True)
-                (out_dir / f"sample_{i}.py").write_text(code)
+            prompt = build_prompt(meta["task"], meta["signature"], strat_note)
+            if strat_key == "debug_hint":
+                prompt = prompt + "\n" + DEBUG_HINTS.get(prob, "")
+            step = max(1, args.candidates)
+            jobs.extend((prob, strat_key, prompt, list(range(c, min(int(args.n), c + step))))
+                        for c in range(0, int(args.n), step))
+    asyncio.run(run_jobs(jobs, args, out_root))
 
     print("Done.")
 
@@ -1,5 +1,8 @@
 
-import os, time, pathlib, re, argparse, requests, ast
+import pathlib, re, argparse, ast
+
+from scripts.ollama_client import get_client
+from scripts.llm_cache import add_cache_args, apply_cache_args
 
 CODE_FENCE_RE = re.compile(r"```(?:python)?\s*(.*?)```", flags=re.S | re.I)
 
@@ -76,10 +79,15 @@ Begin your answer with exactly:
 and end with:
 """
 
-def llama_generate(prompt, model="codellama:7b-instruct", temperature=0.1, retries=1):
+def llama_generate(prompt, model="codellama:7b-instruct", temperature=0.1, retries=1, variant=None):
+    return llama_submit(prompt, model, temperature, retries, variant).result()
+
+def llama_submit(prompt, model="codellama:7b-instruct", temperature=0.1, retries=1, variant=None):
     """
-    Call Ollama local API with a long timeout (first load of weights can be slow).
+    Call Ollama local API through the shared pooled client, with a long timeout
+    (first load of weights can be slow; keep_alive keeps them loaded afterwards).
     No stop tokens; we rely on fenced extraction.
+    Returns a Future, so several samples can be in flight on the client's pool.
     """
     opts = {
         "temperature": temperature,
@@ -87,31 +95,8 @@ def llama_generate(prompt, model="codellama:7b-instruct", temperature=0.1, retri
         "top_p": 0.9,
         "repeat_penalty": 1.05,
     }
-    base = os.environ.get("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
-    url = f"{base}/api/generate"
-
-    last_err = None
-    for _ in range(retries + 2):  
-        try:
-            r = requests.post(
-                url,
-                json={"model": model, "prompt": prompt, "stream": False, "options": opts},
-                timeout=600,  
-            )
-            if r.status_code == 200:
-                text = r.json().get("response", "")
-                if text and text.strip():
-                    return text
-            else:
-                last_err = f"status={r.status_code}, body={r.text[:200]}"
-        except requests.exceptions.ReadTimeout as e:
-            last_err = f"timeout: {e}"
-        except Exception as e:
-            last_err = str(e)
-        time.sleep(3)
-
-    print(f"[ERROR] Ollama generate failed after retries ({last_err})")
-    return ""
+    return get_client().submit(model, prompt, options=opts, attempts=retries + 2, delay=3, timeout=600,
+                               variant=variant)
 
 
 def main():
@@ -121,7 +106,9 @@ def main():
     ap.add_argument("--n", type=int, default=2)
     ap.add_argument("--model", default="llama3.2")  
     ap.add_argument("--temperature", type=float, default=0.1)
+    add_cache_args(ap)
     args = ap.parse_args()
+    apply_cache_args(args)
 
     root = pathlib.Path(__file__).resolve().parents[1]
     out_root = root / "runs" / "raw_generations"
@@ -132,11 +119,15 @@ def main():
     fname = expected_name(sig)
     strat_note = STRATEGIES[args.strategy]
 
+    prompt = build_prompt(meta["task"], sig, strat_note)
+    if args.strategy == "debug_hint":
+        prompt = prompt + "\n" + DEBUG_HINTS.get(args.problem, "")
+    # Ollama has no n-candidates option: pipeline the n first attempts on the client's pool instead
+    firsts = [llama_submit(prompt, model=args.model, temperature=args.temperature, retries=1, variant=i)
+              for i in range(args.n)]
+
     for i in range(args.n):
-        prompt = build_prompt(meta["task"], sig, strat_note)
-        if args.strategy == "debug_hint":
-            prompt = prompt + "\n" + DEBUG_HINTS.get(args.problem, "")
-        raw = llama_generate(prompt, model=args.model, temperature=args.temperature, retries=1)
+        raw = firsts[i].result()
         if not raw:
             print(f"[ERROR] No text for {args.problem}/{args.strategy}/sample_{i}")
             continue
@@ -145,7 +136,7 @@ def main():
 
         if f"def {fname}(" not in code:
             strict = prompt + "\n\nYour last output did not keep the exact function name/signature. Fix it now."
-            raw2 = llama_generate(strict, model=args.model, temperature=0.0, retries=0)
+            raw2 = llama_generate(strict, model=args.model, temperature=0.0, retries=0, variant=i)
             if raw2:
                 code2 = extract_code(raw2)
                 if f"def {fname}(" in code2:
@@ -153,7 +144,7 @@ def main():
 
         if not compilable(code):
             strict2 = prompt + "\n\nYour last output was incomplete. Return ONLY one fenced ```python``` block with a COMPLETE function that compiles."
-            raw3 = llama_generate(strict2, model=args.model, temperature=0.0, retries=0)
+            raw3 = llama_generate(strict2, model=args.model, temperature=0.0, retries=0, variant=i)
             code3 = extract_code(raw3) if raw3 else ""
             if not code3 or not compilable(code3):
                 print(f"[ERROR] Non-compilable code for {args.problem}/{args.strategy}/sample_{i}. Skipping.")
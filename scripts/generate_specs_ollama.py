@@ -1,4 +1,7 @@
-import sys, argparse, pathlib, re, subprocess
+import argparse, pathlib, re
+
+from scripts.ollama_client import get_client
+from scripts.llm_cache import add_cache_args, apply_cache_args
 
 # Where to talk to Ollama
 DEFAULT_MODEL = "llama3.2"
@@ -80,16 +83,8 @@ def extract_code(text: str) -> str:
 
 
 def run_ollama(prompt: str, model: str, timeout_sec: int = 600) -> str:
-    """Call `ollama run` and return the raw text response."""
-    res = subprocess.run(
-        ["ollama", "run", model],
-        input=prompt,
-        text=True,
-        capture_output=True,
-        timeout=timeout_sec,
-    )
-    txt = (res.stdout or "").strip()
-    return txt
+    """Generate with the shared Ollama client and return the raw text response."""
+    return get_client().generate(model, prompt, timeout=timeout_sec).strip()
 
 
 def main():
@@ -110,7 +105,9 @@ def main():
         default=DEFAULT_MODEL,
         help="Ollama model name (default: llama3.2)",
     )
+    add_cache_args(ap)
     args = ap.parse_args()
+    apply_cache_args(args)
 
     meta = PROBLEMS[args.problem]
     prompt = SPEC_PROMPT_TEMPLATE.format(
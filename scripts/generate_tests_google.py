@@ -2,6 +2,8 @@ import os, pathlib, sys, argparse, re
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 
+from scripts.llm_cache import get_cache, add_cache_args, apply_cache_args
+
 DEFAULT_MODEL = "models/gemini-2.5-flash"
 
 TEST_PROMPT_TEMPLATE = """You are a Python unit-test generator.
@@ -100,7 +102,9 @@ def main():
     ap.add_argument("--outfile", required=True)
     ap.add_argument("--model", default=DEFAULT_MODEL)
     ap.add_argument("--temperature", type=float, default=0.1)
+    add_cache_args(ap)
     args = ap.parse_args()
+    apply_cache_args(args)
 
     assert os.environ.get("GOOGLE_API_KEY"), "Set GOOGLE_API_KEY"
     genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
@@ -120,12 +124,13 @@ def main():
         if cat is not None:
             _safety[cat] = HarmBlockThreshold.BLOCK_NONE
 
+    system_instruction = (
+        "You are generating harmless Python unit tests for simple algorithms. "
+        "Avoid any unsafe content. Output only code when asked."
+    )
     model = genai.GenerativeModel(
         args.model,
-        system_instruction=(
-            "You are generating harmless Python unit tests for simple algorithms. "
-            "Avoid any unsafe content. Output only code when asked."
-        ),
+        system_instruction=system_instruction,
         safety_settings=_safety,
     )
 
@@ -137,23 +142,29 @@ def main():
         hints=HINTS[args.problem],
     )
 
-    # Lower temp, set plain text, and reasonable token budget
-    resp = model.generate_content(
-        prompt,
-        generation_config={
-            "temperature": args.temperature,
-            "max_output_tokens": 1200,
-            "response_mime_type": "text/plain",
-        },
-        # You can also relax or customize safety settings if needed:
-        # safety_settings={"HARASSMENT": "block_none", ...}
-        request_options={"timeout": 90},
-    )
-
-    text = response_to_text(resp)
-    if not text.strip():
-        explain_failure(resp)
-        sys.exit(2)
+    cache = get_cache()
+    key = cache.key("google", args.model, prompt,
+                    {"temperature": args.temperature, "max_output_tokens": 1200, "system": system_instruction})
+    text = cache.get(key)
+    if text is None:
+        # Lower temp, set plain text, and reasonable token budget
+        resp = model.generate_content(
+            prompt,
+            generation_config={
+                "temperature": args.temperature,
+                "max_output_tokens": 1200,
+                "response_mime_type": "text/plain",
+            },
+            # You can also relax or customize safety settings if needed:
+            # safety_settings={"HARASSMENT": "block_none", ...}
+            request_options={"timeout": 90},
+        )
+
+        text = response_to_text(resp)
+        if not text.strip():
+            explain_failure(resp)
+            sys.exit(2)
+        cache.put(key, text)
 
     code = extract_fenced(text)
     pathlib.Path(args.outfile).write_text(code + "\n")
@@ -0,0 +1,146 @@
+import atexit, hashlib, json, os, pathlib, sys, threading
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+CACHE_DIR = ROOT / "runs" / "llm_cache"
+DEFAULT_MAX_MB = 512
+MODES = ("on", "off", "refresh")   # refresh: never read, but still store the new responses
+
+class LLMCache:
+    """
+    Content-addressed store of LLM responses, one JSON file per
+    (provider, model, prompt, options, variant) under runs/llm_cache/ab/<sha256>.json.
+
+    `variant` tells apart calls that are meant to differ, e.g. sample i of n
+    for the same prompt. A hit refreshes the file's mtime; once the cache
+    outgrows max_bytes the least recently used files are deleted down to 90%.
+    Empty responses are never stored. Safe to share between threads.
+    """
+
+    def __init__(self, root: pathlib.Path = CACHE_DIR, max_bytes: int = DEFAULT_MAX_MB << 20, mode: str = "on"):
+        self.root = pathlib.Path(root)
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+        self._size = None   # bytes on disk, computed on first write
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(provider: str, model: str, prompt: str, options: dict | None = None, variant=None) -> str:
+        blob = json.dumps([provider, model, prompt, options or {}, variant], sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str):
+        if self.mode != "on":
+            if self.mode == "refresh":
+                self._bump("misses")
+            return None
+        path = self._path(key)
+        try:
+            value = json.loads(path.read_text())
+            os.utime(path)
+        except (OSError, ValueError):
+            self._bump("misses")
+            return None
+        self._bump("hits")
+        return value
+
+    def put(self, key: str, value) -> None:
+        if self.mode == "off" or not value:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(value)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.stats["writes"] += 1
+            if self._size is None:
+                self._size = sum(p.stat().st_size for p in self.root.glob("*/*.json"))
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        files = []
+        for p in self.root.glob("*/*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for _, size, p in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            self.stats["evicted"] += 1
+        self._size = total
+
+    def cached(self, provider: str, model: str, prompt: str, call, options: dict | None = None, variant=None):
+        """call() on a miss, with the result stored; the cached result on a hit."""
+        key = self.key(provider, model, prompt, options, variant)
+        value = self.get(key)
+        if value is None:
+            value = call()
+            self.put(key, value)
+        return value
+
+    async def acached(self, provider: str, model: str, prompt: str, call, options: dict | None = None, variant=None):
+        """cached() for a coroutine function `call`."""
+        key = self.key(provider, model, prompt, options, variant)
+        value = self.get(key)
+        if value is None:
+            value = await call()
+            self.put(key, value)
+        return value
+
+    def _bump(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def summary(self) -> str:
+        s = self.stats
+        looked = s["hits"] + s["misses"]
+        rate = f" ({100 * s['hits'] / looked:.0f}% hit)" if looked else ""
+        return f"llm cache [{self.mode}]: {s['hits']} hits, {s['misses']} misses{rate}, {s['writes']} stored, {s['evicted']} evicted"
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+def get_cache() -> LLMCache:
+    """
+    The process-wide cache. LLM_CACHE=on|off|refresh and LLM_CACHE_MAX_MB set
+    its defaults; scripts with argparse override the mode via add_cache_args.
+    """
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            mode = os.environ.get("LLM_CACHE", "on")
+            _CACHE = LLMCache(max_bytes=int(os.environ.get("LLM_CACHE_MAX_MB", DEFAULT_MAX_MB)) << 20,
+                              mode=mode if mode in MODES else "on")
+            atexit.register(_report)
+        return _CACHE
+
+def _report() -> None:
+    s = _CACHE.stats
+    if s["hits"] or s["misses"] or s["writes"]:
+        print(_CACHE.summary(), file=sys.stderr)
+
+def add_cache_args(ap) -> None:
+    g = ap.add_mutually_exclusive_group()
+    g.add_argument("--no-cache", action="store_true", help="bypass the LLM response cache entirely")
+    g.add_argument("--refresh", action="store_true", help="ignore cached LLM responses but store the new ones")
+
+def apply_cache_args(args) -> None:
+    cache = get_cache()
+    if args.no_cache:
+        cache.mode = "off"
+    elif args.refresh:
+        cache.mode = "refresh"
@@ -0,0 +1,182 @@
+import argparse, json, math, pathlib, random, re, sys, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+RAW = ROOT / "runs" / "raw_generations"
+
+PROSE = ("This solution handles the edge cases mentioned in the task and runs in linear time. "
+         "It keeps the exact signature and avoids any imports or I/O. ").split()
+
+def load_samples(raw: pathlib.Path = RAW) -> dict:
+    """problem -> [sample source], from runs/raw_generations/<problem>/<model>/<strategy>/sample_*.py."""
+    samples = {}
+    for path in sorted(raw.glob("*/*/*/sample_*.py")):
+        samples.setdefault(path.parts[-4], []).append(path.read_text())
+    return samples
+
+class StandIn:
+    """
+    What an Ollama server (and a Gemini REST endpoint) would answer, minus the model.
+
+    Code prompts get a recorded sample of the problem they name (the first
+    known problem name in the prompt) in a ```python fence, followed by some
+    prose, so early-stopping clients have something to skip. Test-writing
+    prompts get a minimal pytest file. Latency is a lognormal time to first
+    token (median `ttft`, shape `sigma`) plus len(text)/4 tokens at `tps`;
+    `error_rate` / `throttle_rate` of requests fail with 500 / 429.
+    """
+
+    def __init__(self, samples: dict, ttft: float = 0.2, sigma: float = 0.5, tps: float = 200.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, prose_words: int = 120, seed: int = 0):
+        self.samples = samples
+        self.names = sorted(samples, key=len, reverse=True)   # longest first, so a name inside another never wins
+        self.ttft, self.sigma, self.tps = ttft, sigma, tps
+        self.error_rate, self.throttle_rate = error_rate, throttle_rate
+        self.prose_words = prose_words
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "aborted": 0}
+
+    def _random(self):
+        with self.lock:
+            return self.rng.random(), self.rng.gauss(0, 1), self.rng.randrange(1 << 30)
+
+    def reply(self, prompt: str) -> tuple[int, str, float, float]:
+        """(status, text, seconds to first token, seconds per token) for one request."""
+        u, z, pick = self._random()
+        with self.lock:
+            self.stats["requests"] += 1
+            if u < self.error_rate:
+                self.stats["errors"] += 1
+            elif u < self.error_rate + self.throttle_rate:
+                self.stats["throttled"] += 1
+        if u < self.error_rate:
+            return 500, "stand-in: injected error", 0.0, 0.0
+        if u < self.error_rate + self.throttle_rate:
+            return 429, "stand-in: injected rate limit", 0.0, 0.0
+        problem = next((p for p in self.names if p in prompt), None)
+        if re.search(r"unit-test|pytest tests", prompt, re.I):
+            code = (f"from problems.problems import {problem}\n\n\ndef test_smoke():\n"
+                    f"    assert callable({problem})\n" if problem else "def test_smoke():\n    assert True\n")
+        elif problem:
+            options = self.samples[problem]
+            code = options[pick % len(options)].strip() + "\n"
+        else:
+            code = "def f():\n    return None\n"
+        prose = " ".join(PROSE[i % len(PROSE)] for i in range(pick % (self.prose_words + 1)))
+        text = f"Here is the implementation:\n```python\n{code}```\n\n{prose}\n"
+        return 200, text, self.ttft * math.exp(self.sigma * z), 1.0 / self.tps if self.tps else 0.0
+
+def _tokens(text: str) -> list[str]:
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+def make_handler(stand_in: StandIn):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, obj) -> None:
+            body = json.dumps(obj).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, obj) -> None:
+            line = (json.dumps(obj) + "\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/api/generate":
+                self._ollama(body)
+            elif re.fullmatch(r"/v1beta/models/[^:]+:generateContent", self.path.split("?")[0]):
+                self._gemini(body)
+            else:
+                self._json(404, {"error": f"no route {self.path}"})
+
+        def _ollama(self, body: dict) -> None:
+            prompt = body.get("prompt", "")
+            status, text, first, per_token = stand_in.reply(prompt)
+            time.sleep(first)
+            if status != 200:
+                return self._json(status, {"error": text})
+            toks = _tokens(text)
+            n_prompt = len(prompt) // 4
+            if not body.get("stream", True):
+                time.sleep(per_token * len(toks))
+                return self._json(200, {"model": body.get("model"), "response": text, "done": True,
+                                        "prompt_eval_count": n_prompt, "eval_count": len(toks)})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for tok in toks:
+                    self._chunk({"model": body.get("model"), "response": tok, "done": False})
+                    time.sleep(per_token)
+                self._chunk({"model": body.get("model"), "response": "", "done": True,
+                             "prompt_eval_count": n_prompt, "eval_count": len(toks)})
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                with stand_in.lock:
+                    stand_in.stats["aborted"] += 1   # the client stopped reading, as Ollama would cancel
+                self.close_connection = True
+
+        def _gemini(self, body: dict) -> None:
+            prompt = "\n".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+            count = int(body.get("generationConfig", {}).get("candidateCount", 1) or 1)
+            replies = [stand_in.reply(prompt) for _ in range(count)]
+            time.sleep(max(first + per_token * len(_tokens(text)) for _, text, first, per_token in replies))
+            status, text = next(((s, t) for s, t, _, _ in replies if s != 200), (200, ""))
+            if status != 200:
+                return self._json(status, {"error": {"code": status, "message": text}})
+            out = sum(len(_tokens(t)) for _, t, _, _ in replies)
+            self._json(200, {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": t}]}, "finishReason": "STOP", "index": i}
+                               for i, (_, t, _, _) in enumerate(replies)],
+                "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": out,
+                                  "totalTokenCount": len(prompt) // 4 + out},
+            })
+
+    return Handler
+
+def serve(stand_in: StandIn, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start serving on a daemon thread; the bound port is server.server_address[1]."""
+    server = ThreadingHTTPServer((host, port), make_handler(stand_in))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def add_stand_in_args(ap) -> None:
+    ap.add_argument("--ttft", type=float, default=0.2, help="median seconds to first token")
+    ap.add_argument("--sigma", type=float, default=0.5, help="lognormal shape of the time to first token")
+    ap.add_argument("--tps", type=float, default=200.0, help="tokens per second after the first")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    ap.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    ap.add_argument("--prose-words", type=int, default=120, help="max words of prose after the code fence")
+    ap.add_argument("--seed", type=int, default=0)
+
+def stand_in_from_args(args) -> StandIn:
+    return StandIn(load_samples(), ttft=args.ttft, sigma=args.sigma, tps=args.tps, error_rate=args.error_rate,
+                   throttle_rate=args.throttle_rate, prose_words=args.prose_words, seed=args.seed)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Offline stand-in for Ollama /api/generate and Gemini generateContent")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11434)
+    add_stand_in_args(ap)
+    args = ap.parse_args()
+    stand_in = stand_in_from_args(args)
+    server = serve(stand_in, args.host, args.port)
+    print(f"stand-in serving {sum(map(len, stand_in.samples.values()))} recorded samples on "
+          f"http://{args.host}:{server.server_address[1]} (OLLAMA_HOST=http://{args.host}:{server.server_address[1]})",
+          file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print(json.dumps(stand_in.stats), file=sys.stderr)
@@ -0,0 +1,163 @@
+import json, os, re, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from scripts.llm_cache import get_cache
+
+DEFAULT_HOST = "http://localhost:11434"
+DEFAULT_KEEP_ALIVE = "30m"   # keep the weights resident between calls of a sweep
+DEFAULT_WORKERS = 4
+
+# the same pattern every caller extracts code with; streaming stops at its first match
+FENCE_RE = re.compile(r"```(?:python)?\s*(.*?)```", re.S | re.I)
+
+def ollama_base(host: str | None = None) -> str:
+    base = (host or os.environ.get("OLLAMA_HOST") or DEFAULT_HOST).rstrip("/")
+    return base if "://" in base else f"http://{base}"   # OLLAMA_HOST is often just host:port
+
+class OllamaClient:
+    """
+    One keep-alive HTTP session to an Ollama server, shared by every script.
+
+    Connections are pooled (one per worker), every request asks the server to
+    keep the model loaded for `keep_alive`, and submit()/map() run requests on
+    a bounded thread pool so several generations can be in flight at once.
+    Responses go through the shared LLM cache; token counts reported by the
+    server (i.e. for cache misses) are summed in `usage`; for streams cut at
+    the fence they are estimates (the response says "estimated": True).
+
+    With stream=True responses are streamed and the request is closed as soon
+    as the text contains a complete ```python fence, which aborts generation
+    on the server. Callers only ever keep the first fenced block, so they see
+    the same code as from the full response, minus the tokens after it.
+    """
+
+    def __init__(self, host: str | None = None, keep_alive: str = DEFAULT_KEEP_ALIVE,
+                 workers: int = DEFAULT_WORKERS, timeout: float = 600, stream: bool = True):
+        self.base = ollama_base(host)
+        self.keep_alive = keep_alive
+        self.stream = stream
+        self.timeout = timeout
+        self.workers = max(1, workers)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._pool = None
+        self._lock = threading.Lock()
+        self.usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "stopped_at_fence": 0}
+
+    def complete(self, model: str, prompt: str, options: dict | None = None, attempts: int = 3,
+                 delay: float = 2.0, timeout: float | None = None, variant=None, limiter=None) -> dict:
+        """
+        POST /api/generate (non-streaming). Returns {"text", "prompt_tokens",
+        "completion_tokens"}, plus "cached": True when served from the cache;
+        text is "" once every attempt has failed or come back empty. `variant`
+        (e.g. the sample index) keeps otherwise identical requests apart in the
+        cache. A scripts.rate_limit.RateLimiter paces the cache misses
+        (reserving the prompt plus num_predict tokens).
+        """
+        cache = get_cache()
+        key = cache.key("ollama", model, prompt, options, variant)
+        hit = cache.get(key)
+        if hit is not None:
+            return {**hit, "cached": True}
+        if limiter is not None:
+            reserved = len(prompt) // 4 + (options or {}).get("num_predict", 0)
+            limiter.acquire(reserved)
+        out = self._complete(model, prompt, options, attempts, delay, timeout)
+        if limiter is not None:
+            limiter.settle(reserved, out["prompt_tokens"] + out["completion_tokens"])
+        if out["text"].strip():
+            cache.put(key, out)
+        return out
+
+    def _complete(self, model, prompt, options, attempts, delay, timeout) -> dict:
+        body = {"model": model, "prompt": prompt, "stream": self.stream, "keep_alive": self.keep_alive}
+        if options:
+            body["options"] = options
+        last_err = None
+        for attempt in range(max(1, attempts)):
+            if attempt:
+                time.sleep(delay)
+            try:
+                out = self._post(body, timeout or self.timeout)
+            except (requests.RequestException, ValueError) as e:
+                last_err = str(e)
+                continue
+            self._count(out)
+            if out["text"].strip():
+                return out
+            last_err = "empty response"
+        print(f"[ERROR] Ollama {model} failed after {attempts} attempts ({last_err})", file=sys.stderr)
+        return {"text": "", "prompt_tokens": 0, "completion_tokens": 0}
+
+    def _post(self, body: dict, timeout: float) -> dict:
+        with self.session.post(f"{self.base}/api/generate", json=body, timeout=timeout, stream=body["stream"]) as r:
+            if r.status_code != 200:
+                raise ValueError(f"status={r.status_code}, body={r.text[:200]}")
+            if not body["stream"]:
+                data = r.json()
+                return {"text": data.get("response", "") or "",
+                        "prompt_tokens": data.get("prompt_eval_count", 0) or 0,
+                        "completion_tokens": data.get("eval_count", 0) or 0}
+            pieces, chunks, data, fenced = [], 0, {}, False
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise ValueError(data["error"])
+                piece = data.get("response", "") or ""
+                pieces.append(piece)
+                chunks += 1
+                if data.get("done"):
+                    break
+                if "`" in piece and FENCE_RE.search("".join(pieces)):
+                    fenced = True
+                    break   # leaving the block drops the connection, which cancels the generation
+        # a stream cut at the fence never gets the final chunk with the counts: estimate them
+        # (the prompt as the limiter's reservation does, ~4 chars/token; one token per chunk)
+        return {"text": "".join(pieces),
+                "prompt_tokens": data.get("prompt_eval_count", 0) or (len(body["prompt"]) // 4 if fenced else 0),
+                "completion_tokens": data.get("eval_count", 0) or chunks,
+                "stopped_at_fence": fenced,
+                "estimated": fenced}
+
+    def generate(self, model: str, prompt: str, **kw) -> str:
+        return self.complete(model, prompt, **kw)["text"]
+
+    def submit(self, model: str, prompt: str, **kw):
+        """generate() on the shared pool; returns a Future of the text."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="ollama")
+        return self._pool.submit(self.generate, model, prompt, **kw)
+
+    def map(self, model: str, prompts, **kw) -> list[str]:
+        futures = [self.submit(model, p, **kw) for p in prompts]
+        return [f.result() for f in futures]
+
+    def _count(self, out: dict) -> None:
+        with self._lock:
+            self.usage["requests"] += 1
+            self.usage["prompt_tokens"] += out["prompt_tokens"]
+            self.usage["completion_tokens"] += out["completion_tokens"]
+            self.usage["stopped_at_fence"] += bool(out.get("stopped_at_fence"))
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+        self.session.close()
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+def get_client() -> OllamaClient:
+    """The process-wide client, so every caller shares one connection pool."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = OllamaClient(workers=int(os.environ.get("OLLAMA_WORKERS", DEFAULT_WORKERS)),
+                                   stream=os.environ.get("OLLAMA_STREAM", "1") != "0")
+        return _CLIENT
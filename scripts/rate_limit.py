@@ -0,0 +1,83 @@
+import asyncio, random, threading, time
+
+class TokenBucket:
+    """
+    `per_minute` units refilled continuously, up to `burst` (default: one
+    minute's worth). take(n) reserves n units and returns how long the caller
+    must wait before using them; the level may go negative, so concurrent
+    callers queue up in order instead of polling.
+    """
+
+    def __init__(self, per_minute: float, burst: float | None = None):
+        self.rate = per_minute / 60.0
+        self.burst = per_minute if burst is None else burst
+        self.level = self.burst
+        self.stamp = time.monotonic()
+
+    def take(self, n: float, now: float) -> float:
+        self.level = min(self.burst, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+        self.level -= n
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def refund(self, n: float) -> None:
+        self.level = min(self.burst, self.level + n)
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute quota for one provider, shared
+    by threads (acquire) and asyncio tasks (aacquire). A limit of 0 disables it.
+
+    throttled() is called on a 429: every caller pauses for an exponentially
+    growing delay and the request rate is cut (multiplicative decrease);
+    succeeded() grows it back towards the configured rate (additive increase).
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, base_delay: float = 2.0, max_delay: float = 60.0):
+        self.rpm = rpm
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.base_delay, self.max_delay = base_delay, max_delay
+        self.delay = 0.0
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        with self.lock:
+            now = time.monotonic()
+            wait = max(0.0, self.paused_until - now)
+            if self.requests:
+                wait = max(wait, self.requests.take(1, now))
+            if self.tokens and tokens:
+                wait = max(wait, self.tokens.take(min(tokens, self.tokens.burst), now))
+            return wait
+
+    def acquire(self, tokens: float = 0) -> None:
+        wait = self._reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: float = 0) -> None:
+        wait = self._reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def settle(self, reserved: float, used: float) -> None:
+        """Correct a token reservation once the response reports actual usage."""
+        if self.tokens and used:
+            with self.lock:
+                self.tokens.refund(reserved - used)
+
+    def throttled(self, retry_after: float | None = None) -> None:
+        with self.lock:
+            self.delay = min(self.max_delay, self.delay * 2 if self.delay else self.base_delay)
+            pause = retry_after if retry_after else self.delay * random.uniform(0.8, 1.2)
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            if self.requests:
+                self.requests.rate = max(self.rpm / 60.0 * 0.1, self.requests.rate * 0.5)
+
+    def succeeded(self) -> None:
+        with self.lock:
+            self.delay = 0.0
+            if self.requests:
+                self.requests.rate = min(self.rpm / 60.0, self.requests.rate + self.rpm / 60.0 * 0.05)
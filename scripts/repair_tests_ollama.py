@@ -1,5 +1,8 @@
 import subprocess, sys, pathlib, re
 
+from scripts.ollama_client import get_client
+
+
 MODEL = "llama3.2"
 FENCE = re.compile(r"```(?:python)?\s*(.*?)```", re.S|re.I)
 
@@ -56,17 +59,14 @@ def run_pytest_on(path: pathlib.Path):
                          capture_output=True, text=True)
     return res.returncode, (res.stdout + "\n" + res.stderr)[-4000:]
 
-def ask_llm(prompt: str, model: str = MODEL) -> str:
-    res = subprocess.run(["ollama", "run", model],
-                         input=prompt, text=True,
-                         capture_output=True, timeout=600)
-    txt = res.stdout
+def ask_llm(prompt: str, model: str = MODEL, variant=None) -> str:
+    txt = get_client().generate(model, prompt, timeout=600, variant=variant)
     m = FENCE.search(txt)
     return (m.group(1) if m else txt).strip()
 
 def main():
     if len(sys.argv) < 3:
-        print("Usage: python scripts/repair_tests_ollama.py <is_anagram|word_wrap> <test_file.py> [rounds]")
+        print("Usage: python -m scripts.repair_tests_ollama <is_anagram|word_wrap> <test_file.py> [rounds]")
         sys.exit(1)
     prob = sys.argv[1]
     test_path = pathlib.Path(sys.argv[2])
@@ -85,7 +85,7 @@ def main():
             current=current,
             failure=fail,
         )
-        fixed = ask_llm(prompt)
+        fixed = ask_llm(prompt, variant=i)  # a repeated prompt in a later round still gets a fresh answer
         test_path.write_text(fixed + "\n")
         print(f"[repair] Rewrote {test_path} (round {i+1})")
     print("[warn] Still failing after repair rounds.")
@@ -0,0 +1,40 @@
+import pathlib
+from scripts.failure_digest import describe, digest
+
+# junit <failure> text of a multi-assert test whose second assert fails
+MULTI = '''def test_roman_to_int():
+        assert roman_to_int("III") == 3
+>       assert roman_to_int("IV") == 4
+E       AssertionError: assert 2 == 4
+E        +  where 2 = roman_to_int('IV')
+
+tests/test_problems.py:6: AssertionError'''
+MESSAGE = "AssertionError: assert 2 == 4\n +  where 2 = roman_to_int('IV')"
+
+def test_call_is_taken_from_the_failing_assert():
+    info = describe(MULTI, MESSAGE, "roman_to_int")
+    assert info["call"] == 'roman_to_int("IV")'
+    assert info["check"] == 'assert roman_to_int("IV") == 4'
+    assert (info["actual"], info["expected"]) == ("2", "4")
+
+def test_call_falls_back_to_the_test_body():
+    text = '''def test_word_wrap():
+        out = word_wrap("a b c", 1)
+>       assert out == ["a", "b", "c"]
+E       AssertionError: assert [] == ['a', 'b', 'c']
+
+tests/test_problems.py:3: AssertionError'''
+    info = describe(text, "AssertionError: assert [] == ['a', 'b', 'c']", "word_wrap")
+    assert info["call"] == 'word_wrap("a b c", 1)'
+
+def test_digest_skips_the_stop_after_x_collection_error(tmp_path: pathlib.Path):
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "test_problems.py").write_text("")
+    report = tmp_path / "report.xml"
+    report.write_text(f'''<testsuites><testsuite>
+<testcase classname="tests.test_problems" name="test_roman_to_int"><failure message="{MESSAGE}">{MULTI}</failure></testcase>
+<testcase classname="" name="tests.test_spec_roman"><error message="collection failure">_pytest.main.Failed: stopping after 1 failures</error></testcase>
+</testsuite></testsuites>''')
+    out = digest(report, tmp_path, "roman_to_int")
+    assert out.startswith("FAILED tests/test_problems.py::test_roman_to_int\n  call: roman_to_int(\"IV\")")
+    assert "ERROR collecting" not in out and "stopping after" not in out
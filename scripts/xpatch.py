@@ -8,14 +8,36 @@ import shutil
 import argparse
 import pathlib
 import tempfile
+import threading
 import subprocess
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
-import google.generativeai as genai
-import requests
 
+from eval.selection import load_index, tests_for
+from scripts.ollama_client import get_client
+from scripts.llm_cache import get_cache, add_cache_args, apply_cache_args
+from scripts.rate_limit import RateLimiter
+from scripts.failure_digest import DEFAULT_TOKENS, digest, node_id
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 
+# per-provider quotas shared by every thread (0 = unlimited); xpatch_matrix sets them
+LIMITERS = {"google": RateLimiter(), "llama": RateLimiter()}
+_meter = threading.local()
+_meter_lock = threading.Lock()
+
+def set_meter(meter: Optional[dict]) -> None:
+    """Count the tokens of this thread's LLM calls into meter["prompt_tokens"] / ["completion_tokens"]."""
+    _meter.current = meter
+
+def _count(out: dict) -> None:
+    meter = getattr(_meter, "current", None)
+    if meter is not None:
+        with _meter_lock:
+            meter["prompt_tokens"] = meter.get("prompt_tokens", 0) + out.get("prompt_tokens", 0)
+            meter["completion_tokens"] = meter.get("completion_tokens", 0) + out.get("completion_tokens", 0)
+
 PROBLEMS = {
     "two_sum": {"signature":"def two_sum(nums: list[int], target: int) -> tuple[int,int] | None:", "task":"Find i<j with nums[i]+nums[j]==target; return (i,j) else None."},
     "is_anagram":{"signature":"def is_anagram(a: str, b: str) -> bool:", "task":"Case-insensitive; ignore spaces/punct; True if anagrams."},
@@ -139,56 +161,187 @@ def apply_unified_diff(original: str, diff_txt: str) -> Optional[str]:
     out.extend(src[i:])
     return "\n".join(out)
 
-def write_temp_project(workdir: pathlib.Path, func_src: str) -> None:
-    (workdir / "problems").mkdir(parents=True, exist_ok=True)
-    (workdir / "problems" / "__init__.py").write_text("")
-    
-    base_problems_path = ROOT / "problems" / "problems.py"
-    if base_problems_path.exists():
-        base = base_problems_path.read_text()
-        (workdir / "problems" / "problems.py").write_text(
-            base.rstrip() + "\n\n# --- candidate ---\n" + func_src + "\n"
-        )
-    else:
-        print(f"Warning: Base problems file not found at {base_problems_path}", file=sys.stderr)
-        (workdir / "problems" / "problems.py").write_text(func_src + "\n")
-
-    tests_path = ROOT / "tests"
-    if tests_path.exists():
-        shutil.copytree(tests_path, workdir / "tests")
-    else:
-        print(f"Error: Tests directory not found at {tests_path}", file=sys.stderr)
-        sys.exit(1)
+def _link_or_copy(src: pathlib.Path, dst: pathlib.Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)   # tests are only read, so sharing the inode is safe
+    except OSError:         # other filesystem, or links not allowed
+        shutil.copyfile(src, dst)
 
+class Workspace:
+    """
+    One temp project per problem, reused for every round.
+
+    problems/ holds the base problems.py (read once, kept in memory) with the
+    candidate appended; tests/ holds hard links (copies across filesystems)
+    to the problem's test modules, or the whole tests/ tree when the test
+    index has no entry for it. Between rounds only problems.py is rewritten
+    and its bytecode dropped, so pytest's own cache and the assertion-rewritten
+    test modules in tests/__pycache__ stay warm. Use as a context manager.
+
+    `failed` remembers the node ids that failed last time (read from a
+    --junitxml report). The next test() runs those first with -x and only
+    runs the rest of the selection once they all pass, so a candidate that
+    still fails is rejected after one test, with output to match.
+
+    With digest_tokens > 0 a failing test() returns a failure digest of that
+    many tokens (see scripts.failure_digest) instead of the raw pytest output.
+    """
 
-def run_pytests(workdir: pathlib.Path, kexpr: str, timeout_s: int = 60):
+    def __init__(self, kexpr: Optional[str] = None, prefix: str = "xpatch_", digest_tokens: int = 0,
+                 index: Optional[dict] = None):
+        self.kexpr = kexpr
+        self.index = load_index() if index is None else index
+        self.digest_tokens = digest_tokens
+        self.failed: list[str] = []
+        self.dir = pathlib.Path(tempfile.mkdtemp(prefix=prefix))
+        base_problems_path = ROOT / "problems" / "problems.py"
+        if base_problems_path.exists():
+            self.base = base_problems_path.read_text().rstrip() + "\n\n# --- candidate ---\n"
+        else:
+            print(f"Warning: Base problems file not found at {base_problems_path}", file=sys.stderr)
+            self.base = ""
+        (self.dir / "problems").mkdir()
+        (self.dir / "problems" / "__init__.py").write_text("")
+
+        tests_path = ROOT / "tests"
+        if not tests_path.exists():
+            print(f"Error: Tests directory not found at {tests_path}", file=sys.stderr)
+            sys.exit(1)
+        sel = tests_for(kexpr, self.index) if kexpr else None
+        if sel is None:
+            rels = [p.relative_to(ROOT) for p in tests_path.rglob("*") if p.is_file() and "__pycache__" not in p.parts]
+        else:
+            # only the modules the problem's tests live in (see eval.selection)
+            rels = ["tests/__init__.py", *sel[0]]
+        for rel in rels:
+            _link_or_copy(ROOT / rel, self.dir / rel)
+
+    def write(self, func_src: str) -> None:
+        """Make func_src the candidate under test."""
+        (self.dir / "problems" / "problems.py").write_text(self.base + func_src + "\n")
+        # a rewrite within the same second and of the same size would pass the .pyc staleness check
+        shutil.rmtree(self.dir / "problems" / "__pycache__", ignore_errors=True)
+
+    def test(self, func_src: str, timeout_s: int = 60, cancel: Optional[threading.Event] = None):
+        self.write(func_src)
+        report = self.dir / "report.xml"
+        rest, first = [], self.failed
+        if first:
+            ok, out = self._run(report, timeout_s, cancel, first, ["-x"])
+            if not ok:
+                return ok, out
+            rest = [a for node in first for a in ("--deselect", node)]
+        # exit code 5: nothing left once the earlier failures are deselected
+        return self._run(report, timeout_s, cancel, None, rest, (0, 5) if first else (0,))
+
+    def _run(self, report, timeout_s, cancel, nodes, extra, ok_codes=(0,)):
+        report.unlink(missing_ok=True)
+        ok, out = run_pytests(self.dir, self.kexpr, timeout_s, cancel, nodes, [*extra, f"--junitxml={report}"], ok_codes,
+                              self.index)
+        outcomes = junit_outcomes(report, self.dir)
+        # failures of this run first, then earlier ones it did not get to (-x, timeout)
+        self.failed = [n for n, passed in outcomes.items() if not passed] + \
+                      [n for n in self.failed if n not in outcomes]
+        if not ok and self.digest_tokens and self.kexpr:
+            out = digest(report, self.dir, self.kexpr, out, self.digest_tokens)
+        return ok, out
+
+    def close(self) -> None:
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_pytests(workdir: pathlib.Path, kexpr: str, timeout_s: int = 60, cancel: Optional[threading.Event] = None,
+                nodes: Optional[list[str]] = None, extra=(), ok_codes=(0,), index: Optional[dict] = None):
+    """
+    (passed, output tail). `nodes` replaces the problem's test selection;
+    `extra` goes on the pytest command line and `ok_codes` are the exit codes
+    that count as passed. Setting `cancel` kills the run early (it then
+    counts as not passed). `index` is eval.selection's, loaded if not given.
+    """
+    sel = tests_for(kexpr, index)
+    args = nodes or (["-k", kexpr, "tests"] if sel is None else sel[1])
+    if not args:
+        return False, f"[no tests selected for {kexpr}]"
+    p = subprocess.Popen([sys.executable, "-m", "pytest", "-q", *extra, *args],
+                         cwd=workdir, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + timeout_s
+    while True:
+        try:
+            stdout, stderr = p.communicate(timeout=0.1 if cancel else max(0.0, deadline - time.monotonic()))
+            return p.returncode in ok_codes, (stdout + "\n" + stderr)[-6000:]
+        except subprocess.TimeoutExpired:
+            if time.monotonic() < deadline and not (cancel and cancel.is_set()):
+                continue
+            p.kill()
+            stdout, stderr = p.communicate()
+            if cancel and cancel.is_set():
+                return False, "[CANCELLED]"
+            return False, f"[TIMEOUT after {timeout_s}s]\n{stdout or ''}\n{stderr or ''}"
+
+def junit_outcomes(report: pathlib.Path, workdir: pathlib.Path) -> dict[str, bool]:
+    """{node id: passed} for the tests a --junitxml report ran; {} if there is no readable report."""
     try:
-        p = subprocess.run(
-            [sys.executable, "-m", "pytest", "-q", "-k", kexpr, "tests"],
-            cwd=workdir, text=True, capture_output=True, timeout=timeout_s
-        )
-        return p.returncode == 0, (p.stdout + "\n" + p.stderr)[-6000:]
-    except subprocess.TimeoutExpired as e:
-        return False, f"[TIMEOUT after {timeout_s}s]\n{(e.stdout or '')}\n{(e.stderr or '')}"
-
-def call_google(model: str, prompt: str) -> str:
+        cases = ET.parse(report).getroot().iter("testcase")
+    except (OSError, ET.ParseError):
+        return {}
+    out = {}
+    for case in cases:
+        node = node_id(case, workdir)
+        if node is not None:
+            out[node] = not any(child.tag in ("failure", "error") for child in case)
+    return out
+
+def call_google(model: str, prompt: str, temperature: float = 0.2, variant=None) -> str:
+    def miss():
+        out = _call_google(model, prompt, temperature)
+        _count(out)   # only tokens actually spent; cache hits are free
+        return out
+    out = get_cache().cached("google", model, prompt, miss,
+                             {"temperature": temperature, "max_output_tokens": 2000}, variant)
+    return out.get("text", "")
+
+def _call_google(model: str, prompt: str, temperature: float = 0.2) -> dict:
+    """{"text", "prompt_tokens", "completion_tokens"}, or {} (not cached) once every attempt failed."""
+    import google.generativeai as genai  # only needed when a google family is used
+    from google.api_core.exceptions import ResourceExhausted
     assert os.environ.get("GOOGLE_API_KEY"), "Set GOOGLE_API_KEY"
     genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
     m = genai.GenerativeModel(model)
-    for attempt in range(3):
+    limiter = LIMITERS["google"]
+    attempt = 0
+    while attempt < 3:
+        reserved = len(prompt) // 4 + 2000
+        limiter.acquire(reserved)
         try:
             r = m.generate_content(
                 prompt,
                 generation_config={
-                    "temperature": 0.2,
+                    "temperature": temperature,
                     "max_output_tokens": 2000,
                     "response_mime_type": "text/plain",
                 },
                 request_options={"timeout": 90},
             )
+        except ResourceExhausted:
+            limiter.throttled()   # pauses every caller; does not use up an attempt
+            continue
         except Exception:
+            attempt += 1
             time.sleep(1.0)
             continue
+        attempt += 1
+        limiter.succeeded()
+        usage = getattr(r, "usage_metadata", None)
+        tokens = {"prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+                  "completion_tokens": getattr(usage, "candidates_token_count", 0) or 0}
+        limiter.settle(reserved, tokens["prompt_tokens"] + tokens["completion_tokens"])
         try:
             if getattr(r, "candidates", None):
                 for cand in r.candidates:
@@ -196,33 +349,23 @@ def call_google(model: str, prompt: str) -> str:
                     parts = getattr(parts, "parts", []) if parts else []
                     out = [getattr(p, "text", "") for p in parts if getattr(p, "text", "")]
                     if out:
-                        return "\n".join(out)
+                        return {"text": "\n".join(out), **tokens}
             txt = getattr(r, "text", None)
             if isinstance(txt, str) and txt.strip():
-                return txt
+                return {"text": txt, **tokens}
         except Exception:
             pass
         time.sleep(1.0)
-    return ""
+    return {}
  
         
-def call_ollama(model: str, prompt: str) -> str:
-    base = os.environ.get("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
-    url = f"{base}/api/generate"
-    opts = {"temperature":0.1, "num_predict":2048, "top_p":0.9, "repeat_penalty":1.05}
-    last_err = None
-    for _ in range(3):
-        try:
-            r = requests.post(url, json={"model": model, "prompt": prompt, "stream": False, "options": opts}, timeout=600)
-            if r.status_code == 200:
-                return r.json().get("response","")
-            last_err = f"status={r.status_code}, body={r.text[:200]}"
-        except Exception as e:
-            last_err = str(e)
-        time.sleep(2)
-        
-    print(f"Ollama call failed after retries: {last_err}", file=sys.stderr) 
-    return ""
+def call_ollama(model: str, prompt: str, temperature: float = 0.1, variant=None) -> str:
+    opts = {"temperature":temperature, "num_predict":2048, "top_p":0.9, "repeat_penalty":1.05}
+    out = get_client().complete(model, prompt, options=opts, attempts=3, delay=2, timeout=600, variant=variant,
+                                limiter=LIMITERS["llama"])
+    if not out.get("cached"):
+        _count(out)
+    return out["text"]
 
 def gen_code(builder_family: str, builder_model: str, meta: dict) -> str:
     prompt = BUILDER_PROMPT.format(task=meta["task"], signature=meta["signature"])
@@ -243,9 +386,59 @@ def gen_code(builder_family: str, builder_model: str, meta: dict) -> str:
             return code2
     return code
 
-def get_patch_or_replacement(exam_family: str, exam_model: str, meta: dict, code: str, pytest_output: str) -> str:
+def get_patch_or_replacement(exam_family: str, exam_model: str, meta: dict, code: str, pytest_output: str,
+                             candidate: int = 0, fanout_temperature: float = 0.7) -> str:
+    """Candidate 0 is the usual low-temperature suggestion; fan-out candidates sample hotter for diversity."""
     prompt = EXAMINER_PROMPT.format(task=meta["task"], signature=meta["signature"], current_code=code, pytest_output=pytest_output)
-    return call_google(exam_model, prompt) if exam_family=="google" else call_ollama(exam_model, prompt)
+    if candidate == 0:
+        return call_google(exam_model, prompt) if exam_family=="google" else call_ollama(exam_model, prompt)
+    call = call_google if exam_family=="google" else call_ollama
+    return call(exam_model, prompt, temperature=fanout_temperature, variant=candidate)
+
+def patch_from(code: str, suggestion: str) -> Optional[str]:
+    """The examiner's suggestion applied to code (diff or full function), or None if unusable / unchanged."""
+    patched = apply_unified_diff(code, suggestion)
+    if not patched:
+        rep = extract_code(suggestion)
+        if rep.strip().startswith("def "):
+            patched = rep
+    return patched if patched and patched != code else None
+
+def try_candidates(exam_family: str, exam_model: str, meta: dict, code: str, out: str,
+                   spaces: list[Workspace], fanout_temperature: float = 0.7):
+    """
+    Ask for one suggestion per workspace at once and test each usable one in
+    its own workspace. Returns (candidate, patched, passed, output) for the first
+    passing candidate, else for the lowest-numbered usable one, else None.
+    As soon as one passes, queued candidates are dropped and running pytest
+    processes are killed; examiner calls already in flight finish in the
+    background and are ignored.
+    """
+    cancel = threading.Event()
+    meter = getattr(_meter, "current", None)
+
+    def attempt(k):
+        set_meter(meter)
+        suggestion = get_patch_or_replacement(exam_family, exam_model, meta, code, out, k, fanout_temperature)
+        patched = patch_from(code, suggestion)
+        if patched is None or cancel.is_set():
+            return k, patched, False, ""
+        ok, test_out = spaces[k].test(patched, cancel=cancel)
+        if ok:
+            cancel.set()
+        return k, patched, ok, test_out
+
+    pool = ThreadPoolExecutor(len(spaces), thread_name_prefix="xpatch")
+    futures = [pool.submit(attempt, k) for k in range(len(spaces))]
+    done = []
+    for fut in as_completed(futures):
+        done.append(fut.result())
+        if done[-1][2]:
+            break
+    pool.shutdown(wait=False, cancel_futures=True)
+    passing = [d for d in done if d[2]]
+    usable = sorted((d for d in done if d[1] is not None and d[3] != "[CANCELLED]"), key=lambda d: d[0])
+    return (passing or usable or [None])[0]
 
 def main():
     ap = argparse.ArgumentParser(description="Cross-family patch-and-test loop (Part 3).")
@@ -255,49 +448,90 @@ def main():
     ap.add_argument("--exam_family", choices=["google","llama"], required=True)
     ap.add_argument("--exam_model", required=True)
     ap.add_argument("--max_rounds", type=int, default=2)
+    ap.add_argument("--fanout", type=int, default=1, help="patch candidates requested and tested in parallel per round")
+    ap.add_argument("--fanout_temperature", type=float, default=0.7, help="sampling temperature of candidates 2..N")
+    ap.add_argument("--digest_tokens", type=int, default=DEFAULT_TOKENS,
+                    help="token budget of the failure digest shown to the examiner (0 = raw pytest output)")
+    add_cache_args(ap)
     args = ap.parse_args()
+    apply_cache_args(args)
 
-    meta = PROBLEMS[args.problem]
-    kexpr = args.problem
+    run_xpatch(args.problem, args.builder_family, args.builder_model, args.exam_family, args.exam_model,
+               args.max_rounds, fanout=args.fanout, fanout_temperature=args.fanout_temperature,
+               digest_tokens=args.digest_tokens)
 
-    print(f"--- Round 0: Building '{kexpr}' with {args.builder_family}/{args.builder_model} ---", file=sys.stderr)
-    code = gen_code(args.builder_family, args.builder_model, meta)
+def run_xpatch(problem: str, builder_family: str, builder_model: str, exam_family: str, exam_model: str,
+               max_rounds: int = 2, emit=lambda row: print(json.dumps(row)), fanout: int = 1,
+               fanout_temperature: float = 0.7, digest_tokens: int = DEFAULT_TOKENS,
+               index: Optional[dict] = None) -> list[dict]:
+    """
+    Build, test, then examine-and-patch up to max_rounds times; emit(row) per
+    round, rows returned. With fanout > 1 each round races that many examiner
+    candidates (see try_candidates) and keeps the first that passes. The
+    examiner sees a failure digest of digest_tokens (0: raw pytest output).
+    Concurrent callers should pass the test index (eval.selection.load_index)
+    rather than each loading, and possibly rebuilding, it.
+    """
+    meta = PROBLEMS[problem]
+    kexpr = problem
+    rows = []
+    def log(row):
+        rows.append(row)
+        emit(row)
+
+    print(f"--- Round 0: Building '{kexpr}' with {builder_family}/{builder_model} ---", file=sys.stderr)
+    code = gen_code(builder_family, builder_model, meta)
     if not code.strip():
-        print(json.dumps({"round": 0, "passed": False, "error": "Builder returned empty code."}))
-        return
-
-    tmp0 = pathlib.Path(tempfile.mkdtemp(prefix="xpatch_r0_"))
-    write_temp_project(tmp0, code)
-    ok, out = run_pytests(tmp0, kexpr)
-    print(json.dumps({"round": 0, "passed": ok}))
-    if ok or args.max_rounds <= 0:
-        shutil.rmtree(tmp0)
-        return
-
-    for r in range(1, args.max_rounds + 1):
-        print(f"--- Round {r}: Examining with {args.exam_family}/{args.exam_model} ---", file=sys.stderr)
-        suggestion = get_patch_or_replacement(args.exam_family, args.exam_model, meta, code, out)
-        patched = apply_unified_diff(code, suggestion)
-        
-        if not patched:
-            rep = extract_code(suggestion)
-            if rep.strip().startswith("def "):
-                patched = rep
-        
-        if not patched or patched == code:
-            print(json.dumps({"round": r, "patched": False, "reason": "Unusable patch or no change."}))
+        log({"round": 0, "passed": False, "error": "Builder returned empty code."})
+        return rows
+
+    index = load_index() if index is None else index
+    # workspace k serves fan-out candidate k in every round; 0 is also round 0's
+    spaces = [Workspace(kexpr, prefix=f"xpatch_{kexpr}_", digest_tokens=digest_tokens, index=index)]
+    try:
+        ok, out = spaces[0].test(code)
+        log({"round": 0, "passed": ok})
+        if not ok and max_rounds > 0:
+            if fanout > 1:
+                spaces += [Workspace(kexpr, prefix=f"xpatch_{kexpr}_c{k}_", digest_tokens=digest_tokens, index=index)
+                           for k in range(1, fanout)]
+                for space in spaces[1:]:
+                    space.failed = list(spaces[0].failed)
+            patch_rounds(spaces, exam_family, exam_model, meta, code, out, max_rounds, fanout_temperature, log)
+    finally:
+        for space in spaces:
+            space.close()
+    return rows
+
+def patch_rounds(spaces: list[Workspace], exam_family: str, exam_model: str, meta: dict, code: str, out: str,
+                 max_rounds: int, fanout_temperature: float, log) -> None:
+    fanout = len(spaces)
+    for r in range(1, max_rounds + 1):
+        print(f"--- Round {r}: Examining with {exam_family}/{exam_model} ---", file=sys.stderr)
+        if fanout > 1:
+            best = try_candidates(exam_family, exam_model, meta, code, out, spaces, fanout_temperature)
+            if best is None:
+                log({"round": r, "patched": False, "reason": "Unusable patch or no change.", "candidates": fanout})
+                break
+            winner, code, ok, out = best
+            for space in spaces:   # every candidate of the next round starts from the winner's failures
+                space.failed = list(spaces[winner].failed)
+            log({"round": r, "patched": True, "passed": ok, "candidates": fanout, "winner": winner})
+            if ok:
+                break
+            continue
+
+        suggestion = get_patch_or_replacement(exam_family, exam_model, meta, code, out)
+        patched = patch_from(code, suggestion)
+        if patched is None:
+            log({"round": r, "patched": False, "reason": "Unusable patch or no change."})
             break
         
         code = patched
-        tmp = pathlib.Path(tempfile.mkdtemp(prefix=f"xpatch_r{r}_"))
-        write_temp_project(tmp, code)
-        ok, out = run_pytests(tmp, kexpr)
-        print(json.dumps({"round": r, "patched": True, "passed": ok}))
-        shutil.rmtree(tmp)
+        ok, out = spaces[0].test(code)
+        log({"round": r, "patched": True, "passed": ok})
         if ok:
             break
-    
-    shutil.rmtree(tmp0)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,134 @@
+import argparse, itertools, json, os, pathlib, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from scripts import xpatch
+from eval.selection import load_index
+from scripts.rate_limit import RateLimiter
+from scripts.llm_cache import add_cache_args, apply_cache_args
+from scripts.failure_digest import DEFAULT_TOKENS
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+LOGS = ROOT / "runs" / "xpatch_logs.jsonl"
+DEFAULT_JOBS = 8
+# same free-tier quota generate_samples_google.py assumes
+DEFAULT_GOOGLE_RPM = 10
+DEFAULT_GOOGLE_TPM = 250000
+
+def parse_model(spec: str) -> tuple[str, str]:
+    """'family:model' -> (family, model); the model may itself contain ':' (llama3.1:8b)."""
+    family, _, model = spec.partition(":")
+    if family not in ("google", "llama") or not model:
+        raise argparse.ArgumentTypeError(f"expected google:<model> or llama:<model>, got {spec!r}")
+    return family, model
+
+def build_jobs(problems, pairs) -> list[tuple]:
+    """(problem, builder, examiner), problem-major so consecutive jobs hit different providers."""
+    return [(p, b, e) for p in problems for b, e in pairs]
+
+class MatrixLog:
+    """Appends one JSON line per xpatch round (and optionally mirrors it into eval.store)."""
+
+    def __init__(self, path: pathlib.Path, store=None):
+        self.f = open(path, "a")
+        self.store = store
+        self.lock = threading.Lock()
+
+    def write(self, row: dict) -> None:
+        with self.lock:
+            self.f.write(json.dumps(row) + "\n")
+            self.f.flush()
+            if self.store is not None:
+                self.store.log(row)
+
+    def close(self) -> None:
+        self.f.close()
+        if self.store is not None:
+            self.store.close()
+
+def run_job(job, log: MatrixLog, max_rounds: int, fanout: int, digest_tokens: int = DEFAULT_TOKENS,
+            index: dict | None = None) -> list[dict]:
+    """run_xpatch for one (problem, builder, examiner); each round's row gets its latency and tokens."""
+    problem, (bfam, bmodel), (efam, emodel) = job
+    meter = {}
+    xpatch.set_meter(meter)
+    state = {"t": time.perf_counter(), "tokens": 0}
+
+    def emit(row):
+        now, tokens = time.perf_counter(), meter.get("prompt_tokens", 0) + meter.get("completion_tokens", 0)
+        log.write({"problem": problem, "builder": f"{bfam}:{bmodel}", "examiner": f"{efam}:{emodel}", **row,
+                   "latency_s": round(now - state["t"], 3), "tokens": tokens - state["tokens"]})
+        state["t"], state["tokens"] = now, tokens
+
+    try:
+        return xpatch.run_xpatch(problem, bfam, bmodel, efam, emodel, max_rounds, emit=emit, fanout=fanout,
+                                 digest_tokens=digest_tokens, index=index)
+    except Exception as e:
+        print(f"[ERROR] {problem} {bfam}:{bmodel} -> {efam}:{emodel}: {e}", file=sys.stderr)
+        return []
+    finally:
+        xpatch.set_meter(None)
+
+def main():
+    ap = argparse.ArgumentParser(description="Run xpatch over problems x (builder, examiner) pairs concurrently.")
+    ap.add_argument("--problems", default="all", help="comma-separated problems, or 'all'")
+    ap.add_argument("--models", nargs="+", type=parse_model, default=[], metavar="FAMILY:MODEL",
+                    help="every ordered (builder, examiner) pair of these models")
+    ap.add_argument("--pair", nargs=2, type=parse_model, action="append", default=[], metavar=("BUILDER", "EXAMINER"),
+                    help="one explicit pair, e.g. --pair google:gemini-2.5-flash llama:llama3.1:8b (repeatable)")
+    ap.add_argument("--max_rounds", type=int, default=2)
+    ap.add_argument("--fanout", type=int, default=1)
+    ap.add_argument("--digest_tokens", type=int, default=DEFAULT_TOKENS, help="examiner failure digest budget (0 = raw)")
+    ap.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS, help="(problem, pair) runs in flight")
+    ap.add_argument("--google-rpm", type=float, default=DEFAULT_GOOGLE_RPM)
+    ap.add_argument("--google-tpm", type=float, default=DEFAULT_GOOGLE_TPM)
+    ap.add_argument("--llama-rpm", type=float, default=0, help="0 = unlimited (local server)")
+    ap.add_argument("--llama-tpm", type=float, default=0)
+    ap.add_argument("--out", type=pathlib.Path, default=LOGS, help="JSONL the rows are appended to")
+    ap.add_argument("--db", nargs="?", const="", default=None,
+                    help="also log the rows into the SQLite store (default path if no value)")
+    add_cache_args(ap)
+    args = ap.parse_args()
+    apply_cache_args(args)
+
+    problems = sorted(xpatch.PROBLEMS) if args.problems == "all" else args.problems.split(",")
+    unknown = [p for p in problems if p not in xpatch.PROBLEMS]
+    if unknown:
+        ap.error(f"unknown problems: {', '.join(unknown)}")
+    pairs = list(itertools.product(args.models, repeat=2)) + [tuple(p) for p in args.pair]
+    if not pairs:
+        ap.error("give --models and/or --pair")
+
+    xpatch.LIMITERS["google"] = RateLimiter(rpm=args.google_rpm, tpm=args.google_tpm)
+    xpatch.LIMITERS["llama"] = RateLimiter(rpm=args.llama_rpm, tpm=args.llama_tpm)
+    # one pooled connection per concurrent Ollama request
+    os.environ.setdefault("OLLAMA_WORKERS", str(args.jobs * max(1, args.fanout)))
+
+    store = None
+    if args.db is not None:
+        from eval.store import ResultsStore, DB
+        store = ResultsStore(pathlib.Path(args.db) if args.db else DB)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    log = MatrixLog(args.out, store)
+
+    index = load_index()   # once, before the threads; each would otherwise rebuild a stale index itself
+    jobs = build_jobs(problems, pairs)
+    print(f"{len(jobs)} runs: {len(problems)} problems x {len(pairs)} pairs, {args.jobs} at a time", file=sys.stderr)
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max(1, args.jobs)) as pool:
+            results = list(pool.map(lambda job: run_job(job, log, args.max_rounds, args.fanout, args.digest_tokens, index), jobs))
+    finally:
+        log.close()
+
+    summary = {}
+    for (_, b, e), rows in zip(jobs, results):
+        s = summary.setdefault(f"{b[0]}:{b[1]} -> {e[0]}:{e[1]}", {"runs": 0, "passed_r0": 0, "passed": 0})
+        s["runs"] += 1
+        s["passed_r0"] += bool(rows and rows[0].get("passed"))
+        s["passed"] += bool(rows and rows[-1].get("passed"))
+    print(f"done in {time.perf_counter() - t0:.1f}s -> {args.out}", file=sys.stderr)
+    for pair, s in summary.items():
+        print(f"{pair}: {s['passed_r0']}/{s['runs']} passed at round 0, {s['passed']}/{s['runs']} after patching",
+              file=sys.stderr)
+
+if __name__ == "__main__":
+    main()